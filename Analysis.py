@@ -0,0 +1,436 @@
+# The dashboard's analysis, independent of Streamlit: the aggregate queries and the
+# sidebar filters, the chart rendering helpers and the EDA section builders. Streamlit.py
+# renders the sections; BatchReport.py and benchmarks/pipeline.py use them headless
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+# The species-by-temperature chart has at most TEMPERATURE_BINS bars. Distinct species
+# counts cannot be added up after the fact, so the temperatures are binned in SQL
+TEMPERATURE_BINS = 30
+
+# Aggregations behind each chart. They read the bird_summary_* tables that
+# DataProcessing.build_summary_tables maintains, which are grouped by the filter
+# columns, so their cost depends on the summary size rather than the number of
+# observations. Each entry is the query (with {where} replaced by the sidebar
+# filters) and the grouping columns, whose NULLs are excluded to match pandas
+# groupby/value_counts semantics
+AGGREGATE_QUERIES = {
+    "observations_by_date": ("""
+        SELECT date, SUM(observations)::bigint AS observations FROM bird_summary_daily {where}
+        GROUP BY date ORDER BY date
+    """, ["date"]),
+    "species_by_location_type": ("""
+        SELECT location_type AS "Location Type", COUNT(DISTINCT scientific_name) AS "Number of Species"
+        FROM bird_summary_species {where} GROUP BY 1 ORDER BY 1
+    """, ["location_type"]),
+    "species_by_plot": ("""
+        SELECT plot_name AS "Plot Name", COUNT(DISTINCT scientific_name) AS "Number of Species"
+        FROM bird_summary_plot_species {where} GROUP BY 1 ORDER BY 1
+    """, ["plot_name"]),
+    "activity_patterns": ("""
+        SELECT interval_length, id_method, SUM(observations)::bigint AS "Observations"
+        FROM bird_summary_activity {where} GROUP BY 1, 2 ORDER BY 1, 2
+    """, ["interval_length", "id_method"]),
+    "sex_ratio": ("""
+        SELECT scientific_name, sex, SUM(observations)::bigint AS "Count"
+        FROM bird_summary_sex_species {where} GROUP BY 1, 2 ORDER BY 1, 2
+    """, ["scientific_name", "sex"]),
+    "weather_conditions": ("""
+        SELECT temperature, humidity, sky, wind, SUM(observations)::bigint AS "Observations"
+        FROM bird_summary_weather {where} GROUP BY 1, 2, 3, 4 ORDER BY 1, 2, 3, 4
+    """, ["temperature", "humidity", "sky", "wind"]),
+    "sightings_by_disturbance": ("""
+        SELECT disturbance AS "Disturbance", SUM(sightings)::bigint AS "Sighting_Count"
+        FROM bird_summary_daily {where} GROUP BY 1 ORDER BY 1
+    """, ["disturbance"]),
+    "distance_counts": ("""
+        SELECT distance AS "Distance", SUM(observations)::bigint AS "Count"
+        FROM bird_summary_distance_species {where} GROUP BY 1 ORDER BY 2 DESC
+    """, ["distance"]),
+    "flyover_counts": ("""
+        SELECT flyover_observed AS "Flyover Observed", SUM(observations)::bigint AS "Count"
+        FROM bird_summary_flyover {where} GROUP BY 1 ORDER BY 2 DESC
+    """, ["flyover_observed"]),
+    "species_by_observer": ("""
+        SELECT observer AS "Observer", COUNT(DISTINCT scientific_name) AS "Unique Species Count"
+        FROM bird_summary_observer_species {where} GROUP BY 1 ORDER BY 1
+    """, ["observer"]),
+    "species_by_visit": ("""
+        SELECT visit AS "Visit", COUNT(DISTINCT scientific_name) AS "Number of Unique Species"
+        FROM bird_summary_visit_species {where} GROUP BY 1 ORDER BY 1
+    """, ["visit"]),
+    "species_by_watchlist_status": ("""
+        SELECT pif_watchlist_status AS "Watchlist Status", COUNT(DISTINCT scientific_name) AS "Species Count"
+        FROM bird_summary_species {where} GROUP BY 1 ORDER BY 1
+    """, ["pif_watchlist_status"]),
+    "species_by_stewardship_status": ("""
+        SELECT regional_stewardship_status AS "Stewardship Status", COUNT(DISTINCT scientific_name) AS "Species Count"
+        FROM bird_summary_species {where} GROUP BY 1 ORDER BY 1
+    """, ["regional_stewardship_status"]),
+    "distance_by_species": ("""
+        SELECT distance, scientific_name, SUM(observations)::bigint AS count
+        FROM bird_summary_distance_species {where} GROUP BY 1, 2 ORDER BY 1, 2
+    """, ["distance", "scientific_name"]),
+    # One bar per temperature while there are at most TEMPERATURE_BINS of them, else
+    # equal-width bins labelled by their centers ("Bin Width" is NULL when not binned)
+    "species_by_temperature": (f"""
+        WITH readings AS (
+            SELECT temperature, scientific_name FROM bird_summary_temperature_species {{where}}
+        ), bounds AS (
+            SELECT MIN(temperature) AS low, (MAX(temperature) - MIN(temperature)) / {TEMPERATURE_BINS} AS width,
+                   COUNT(DISTINCT temperature) > {TEMPERATURE_BINS} AS binned
+            FROM readings
+        )
+        SELECT CASE WHEN binned
+                    THEN low + (LEAST(FLOOR((temperature - low) / NULLIF(width, 0)), {TEMPERATURE_BINS} - 1) + 0.5) * width
+                    ELSE temperature END AS "Temperature",
+               COUNT(DISTINCT scientific_name) AS "Number of Species",
+               MAX(CASE WHEN binned THEN width END) AS "Bin Width"
+        FROM readings CROSS JOIN bounds GROUP BY 1 ORDER BY 1
+    """, ["temperature", "scientific_name"]),
+}
+
+# Rows shown in the "Filtered Data" preview
+PREVIEW_ROWS = 1000
+
+# Queries behind the sidebar and the preview. Only the values the sidebar needs are
+# fetched, not the observations themselves
+FILTER_OPTIONS_QUERY = """
+    SELECT MIN(date) AS min_date, MAX(date) AS max_date,
+           ARRAY_AGG(DISTINCT admin_unit_code ORDER BY admin_unit_code) FILTER (WHERE admin_unit_code IS NOT NULL) AS admin_units,
+           ARRAY_AGG(DISTINCT disturbance ORDER BY disturbance) FILTER (WHERE disturbance IS NOT NULL) AS disturbances
+    FROM bird_summary_daily;
+"""
+OBSERVATION_COUNT_QUERY = "SELECT COALESCE(SUM(observations), 0)::bigint AS n FROM bird_summary_daily {where};"
+PREVIEW_QUERY = f"SELECT * FROM bird_observations {{where}} LIMIT {PREVIEW_ROWS};"
+
+# Upper bounds on what a single chart sends to the browser
+MAX_LINE_POINTS = 2000
+MAX_SCATTER_POINTS = 5000
+SCATTER_BINS = 60
+MAX_BAR_CATEGORIES = 30
+MAX_HEATMAP_ROWS = 50
+WEBGL_THRESHOLD = 1000
+
+# Turn the sidebar filters into a parameterized WHERE clause. Filters set to None
+# are not applied; not_null lists columns whose NULLs should also be excluded
+def build_where_clause(filters, not_null=()):
+    conditions, params = [], []
+    if filters.get("admin_unit_code") is not None:
+        conditions.append("admin_unit_code = %s")
+        params.append(filters["admin_unit_code"])
+    if filters.get("location_type") is not None:
+        conditions.append("location_type = %s")
+        params.append(filters["location_type"])
+    if filters.get("date_range") is not None:
+        conditions.append("date BETWEEN %s AND %s")
+        params.extend(filters["date_range"])
+    if filters.get("disturbance") is not None:
+        conditions.append("disturbance = ANY(%s)")
+        params.append(list(filters["disturbance"]))
+    conditions.extend(f"{column} IS NOT NULL" for column in not_null)
+
+    where = "WHERE " + " AND ".join(conditions) if conditions else ""
+    return where, params
+
+# One of the AGGREGATE_QUERIES for the active filters, as (SQL, parameters)
+def aggregate_query(name, filters):
+    query, group_columns = AGGREGATE_QUERIES[name]
+    where, params = build_where_clause(filters, not_null=group_columns)
+    return query.format(where=where), params
+
+# Rendering helpers: keep what is sent to the browser bounded however large the
+# aggregates get. Line charts are downsampled with LTTB, scatter plots are binned,
+# categorical bars keep their largest categories, and big traces switch to WebGL
+def lttb_indices(x, y, threshold):
+    # Largest-Triangle-Three-Buckets: keep the first and last point and, from each
+    # bucket in between, the point forming the largest triangle with the previously
+    # kept point and the average of the next bucket
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    bucket_size = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        if next_end <= end:
+            next_end = end + 1
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
+
+# Downsample a time series frame (sorted by x) to at most max_points rows
+def downsample_series(df, x, y, max_points=MAX_LINE_POINTS):
+    if len(df) <= max_points:
+        return df
+    x_values = df[x].to_numpy()
+    if x_values.dtype == object:  # Dates come back as datetime.date objects
+        x_values = pd.to_datetime(df[x]).to_numpy()
+    if np.issubdtype(x_values.dtype, np.datetime64):
+        x_values = x_values.astype("datetime64[ns]").astype(np.int64)
+    indices = lttb_indices(x_values.astype(float), df[y].to_numpy(dtype=float), max_points)
+    return df.iloc[indices]
+
+# Keep the max_categories largest categories. For additive values (counts) the rest
+# are summed into an "Other" category; distinct counts cannot be summed, so for
+# those the rest are dropped
+def limit_categories(df, category, value, max_categories=MAX_BAR_CATEGORIES, additive=True, other_label="Other"):
+    totals = df.groupby(category, sort=False)[value].sum().sort_values(ascending=False)
+    if len(totals) <= max_categories:
+        return df
+
+    keep = totals.index[:max_categories - 1 if additive else max_categories]
+    in_top = df[category].isin(keep)
+    if not additive:
+        return df[in_top]
+
+    other = df[~in_top].astype({category: object})
+    other[category] = other_label
+    group_columns = [col for col in df.columns if col != value]
+    other = other.groupby(group_columns, as_index=False, dropna=False, sort=False)[value].sum()
+    return pd.concat([df[in_top], other], ignore_index=True)
+
+# Snap x/y onto a grid of at most bins x bins cells (per remaining group column),
+# summing value, when there are more than max_points points
+def bin_points(df, x, y, value, max_points=MAX_SCATTER_POINTS, bins=SCATTER_BINS):
+    if len(df) <= max_points:
+        return df
+    df = df.copy()
+    for col in (x, y):
+        edges = np.linspace(df[col].min(), df[col].max(), bins + 1)
+        centers = (edges[:-1] + edges[1:]) / 2
+        df[col] = centers[np.clip(np.searchsorted(edges, df[col], side="right") - 1, 0, bins - 1)]
+    group_columns = [col for col in df.columns if col != value]
+    return df.groupby(group_columns, as_index=False, dropna=False)[value].sum()
+
+# WebGL (scattergl) for traces with many points, SVG otherwise
+def render_mode(df):
+    return "webgl" if len(df) > WEBGL_THRESHOLD else "svg"
+
+# Exploratory Data Analysis (EDA)
+# The EDA is split into sections, one per dashboard tab. Each section builder takes
+# fetch(name), which returns the result of one of the AGGREGATE_QUERIES for the active
+# filters, builds its figures and returns the blocks to render: ("subheader", text),
+# ("chart", figure, note) or ("summary", text)
+def summary(text):
+    return ("summary", f"**Summary:** {text}")
+
+def temporal_section(fetch):
+    # 1. Temporal Analysis: Observations by Date
+    date_counts = downsample_series(fetch("observations_by_date"), "date", "observations")
+    fig = px.line(x=date_counts["date"], y=date_counts["observations"], labels={'x': 'Date', 'y': 'Number of Observations'}, render_mode=render_mode(date_counts))
+    return [
+        ("subheader", "1. Temporal Analysis Observations by Date"),
+        ("chart", fig, None),
+        summary("The temporal analysis shows the number of bird observations over time. Peaks in the graph indicate periods of higher bird activity, which may correlate with migration or breeding seasons."),
+    ]
+
+def spatial_section(fetch):
+    # 2. Spatial Analysis: Species Diversity by Location Type
+    location_diversity = fetch("species_by_location_type")
+    fig_species_diversity = px.bar(
+        location_diversity, 
+        x='Location Type', 
+        y='Number of Species', 
+        title='Species Richness by Location Type', 
+        color='Location Type'
+    )
+
+    # Plot-Level Analysis: Observations by Plot Name
+    plot_observations = fetch("species_by_plot")
+    top_plots = limit_categories(plot_observations, 'Plot Name', 'Number of Species', additive=False)
+    fig_plot_observations = px.bar(top_plots, x='Plot Name', y='Number of Species', title='Species Observations by Plot Name', color='Plot Name')
+    plot_note = f"Showing the {len(top_plots)} most species-rich of {len(plot_observations)} plots." if len(top_plots) < len(plot_observations) else None
+
+    return [
+        ("subheader", "2. Spatial Analysis"),
+        ("chart", fig_species_diversity, None),
+        summary("This chart compares species richness across different location types (e.g., forest, grassland). It highlights which habitats support the highest biodiversity."),
+        ("chart", fig_plot_observations, plot_note),
+        summary("This analysis shows the number of unique species observed in each plot. Plots with higher species counts may indicate biodiversity hotspots."),
+    ]
+
+def species_section(fetch):
+    # 3. Species Analysis
+    # Activity Patterns: Check most common activity types
+    activity_patterns = limit_categories(fetch("activity_patterns"), 'interval_length', 'Observations')
+    fig_activity = px.bar(activity_patterns, x='interval_length', y='Observations', color='id_method', title="Activity Patterns by Interval Length and Method")
+
+    # Sex Ratio: Analyze male-to-female ratio for different species
+    sex_ratio = limit_categories(fetch("sex_ratio"), 'scientific_name', 'Count')
+    fig_sex_ratio = px.bar(sex_ratio, x='scientific_name', y='Count', color='sex', title="Sex Ratio for Species")
+
+    return [
+        ("subheader", "3. Species Analysis"),
+        ("chart", fig_activity, None),
+        summary("This chart shows the most common bird activity patterns based on observation intervals and identification methods. It helps identify preferred observation durations and methods."),
+        ("chart", fig_sex_ratio, None),
+        summary("The sex ratio analysis reveals the male-to-female distribution across species. Some species may show a skewed ratio, which could indicate gender-based behavioral differences."),
+    ]
+
+def environmental_section(fetch):
+    # 4. Environmental Conditions: Weather Correlation
+    weather_conditions = fetch("weather_conditions")
+    # Wind is not plotted, so points differing only in wind are merged before binning
+    weather_points = weather_conditions.groupby(['temperature', 'humidity', 'sky'], as_index=False, observed=True)['Observations'].sum()
+    weather_points = bin_points(weather_points, 'temperature', 'humidity', 'Observations')
+    fig_weather = px.scatter(weather_points, x='temperature', y='humidity', color='sky', title="Weather Correlation with Observations", render_mode=render_mode(weather_points))
+
+    # Impact of Disturbance on Bird Sightings
+    disturbance_effect = limit_categories(fetch("sightings_by_disturbance"), 'Disturbance', 'Sighting_Count')
+    fig_disturbance = px.bar(disturbance_effect, 
+                             x='Disturbance', 
+                             y='Sighting_Count', 
+                             title='Impact of Disturbance on Bird Sightings',
+                             labels={'Disturbance': 'Disturbance Type', 'Sighting_Count': 'Number of Bird Sightings'},
+                             color='Sighting_Count', color_continuous_scale='Viridis')
+    fig_disturbance.update_layout(xaxis_title='Disturbance Type', yaxis_title='Number of Bird Sightings')
+    fig_disturbance.update_xaxes(tickangle=45)  # Rotate x-axis labels for better readability
+
+    # 9. Number of Bird Species Observed at Different Temperatures
+    temp_bird_counts = fetch("species_by_temperature")
+    bin_width = temp_bird_counts["Bin Width"].max()
+    temperature_note = f"Temperatures are grouped into bins of {bin_width:.1f} °C." if pd.notna(bin_width) else None
+    fig_temperature = px.bar(temp_bird_counts, x='Temperature', y='Number of Species', 
+                             title='9. Number of Bird Species Observed at Different Temperatures',
+                             labels={'Temperature': 'Temperature (°C)', 'Number of Species': 'Unique Species Count'})
+
+    return [
+        ("subheader", "4. Environmental Conditions: Weather Correlation"),
+        ("chart", fig_weather, None),
+        summary("This scatter plot explores the relationship between weather conditions (temperature, humidity, sky, wind) and bird observations. Certain weather conditions may correlate with higher bird activity."),
+        ("subheader", "Impact of Disturbance on Bird Sightings"),
+        ("chart", fig_disturbance, None),
+        summary("This chart shows how different types of disturbances (e.g., human activity, weather events) impact bird sightings. Some disturbances may reduce bird activity, while others may have no significant effect."),
+        ("chart", fig_temperature, temperature_note),
+        summary("This chart shows how bird species diversity varies with temperature. Certain temperature ranges may support higher biodiversity."),
+    ]
+
+def distance_section(fetch):
+    # 5. Distance and Behavior
+    distance_counts = limit_categories(fetch("distance_counts"), 'Distance', 'Count')
+    fig_distance = px.bar(
+        distance_counts,
+        x="Distance",
+        y="Count",
+        title="Distribution of Observation Distances",
+        labels={"Count": "Number of Observations"},
+        color="Distance"
+    )
+
+    # Flyover Frequency: Detect trends in bird behavior during observation (Flyover_Observed)
+    flyover_counts = fetch("flyover_counts")
+    fig_flyover = px.bar(
+        flyover_counts,
+        x="Flyover Observed",
+        y="Count",
+        title="Flyover Frequency",
+        labels={"Count": "Number of Observations"},
+        color="Flyover Observed"
+    )
+
+    # 8. Distance vs. Species Heatmap
+    # One heatmap row per species: keep the most observed ones and fold the rest into "Other"
+    distance_impact = limit_categories(fetch("distance_by_species"), "scientific_name", "count", MAX_HEATMAP_ROWS)
+    fig_heatmap = px.density_heatmap(
+        distance_impact,
+        x="distance",
+        y="scientific_name",
+        z="count",
+        title="Heatmap of Distance vs. Species Observations",
+        labels={"count": "Observation Density", "distance": "Distance", "scientific_name": "Species"},
+        color_continuous_scale="Viridis"
+    )
+
+    return [
+        ("subheader", "5. Distance and Behavior"),
+        ("subheader", "Distance Analysis"),
+        ("chart", fig_distance, None),
+        summary("This bar chart shows the distribution of observation distances. It helps identify whether birds are typically observed closer or farther from the observer."),
+        ("subheader", "Flyover Frequency Analysis"),
+        ("chart", fig_flyover, None),
+        summary("This chart shows how often flyovers (birds flying overhead) are observed. Frequent flyovers may indicate migration patterns or preferred flight paths."),
+        ("subheader", "8. Distance vs. Species Heatmap"),
+        ("chart", fig_heatmap, None),
+        summary("This heatmap shows the relationship between observation distance and species. It helps identify species that are typically observed at specific distances."),
+    ]
+
+def observer_section(fetch):
+    # 6. Observer Trends & Bias Analysis
+    all_observers = fetch("species_by_observer")
+    observer_counts = limit_categories(all_observers, 'Observer', 'Unique Species Count', additive=False)
+    observer_note = f"Showing the {len(observer_counts)} observers with the most species of {len(all_observers)}." if len(observer_counts) < len(all_observers) else None
+    fig_observer_bias = px.bar(
+        observer_counts, 
+        x='Observer', 
+        y='Unique Species Count', 
+        title='Observer Trends and Bias', 
+        color='Observer'
+    )
+
+    # Visit Patterns: Evaluate repeated visits and species count/diversity
+    visit_counts = fetch("species_by_visit")
+    fig_visit_patterns = px.line(
+        visit_counts, 
+        x='Visit', 
+        y='Number of Unique Species', 
+        title='Visit Patterns and Species Diversity'
+    )
+
+    return [
+        ("subheader", "6. Observer Trends"),
+        ("chart", fig_observer_bias, observer_note),
+        summary("This chart highlights observer trends, showing how many unique species each observer has recorded. It helps identify potential observer bias or expertise."),
+        ("subheader", "Visit Patterns Analysis"),
+        ("chart", fig_visit_patterns, None),
+        summary("This line chart shows how species diversity changes with repeated visits to the same location. Increased diversity over time may indicate effective monitoring or seasonal changes."),
+    ]
+
+def conservation_section(fetch):
+    # 7. Conservation Insights: Watchlist Trends
+    # Watchlist status trends: Count species in each status category
+    watchlist_status_counts = fetch("species_by_watchlist_status")
+    fig_watchlist = px.bar(watchlist_status_counts, x='Watchlist Status', y='Species Count', title='Species Count by PIF Watchlist Status', color='Watchlist Status')
+
+    # Regional Stewardship Status trends
+    stewardship_status_counts = fetch("species_by_stewardship_status")
+    fig_stewardship = px.bar(stewardship_status_counts, x='Stewardship Status', y='Species Count', title='Species Count by Regional Stewardship Status', color='Stewardship Status')
+
+    return [
+        ("subheader", "7. Conservation Insights"),
+        ("chart", fig_watchlist, None),
+        summary("This chart shows the number of species on the PIF Watchlist, highlighting those at risk and requiring conservation focus."),
+        ("chart", fig_stewardship, None),
+        summary("This chart highlights species under regional stewardship, indicating areas where conservation efforts are most needed."),
+    ]
+
+# Dashboard tabs, in display order
+EDA_SECTIONS = {
+    "Temporal": temporal_section,
+    "Spatial": spatial_section,
+    "Species": species_section,
+    "Environmental": environmental_section,
+    "Distance": distance_section,
+    "Observer": observer_section,
+    "Conservation": conservation_section,
+}
+
+# AGGREGATE_QUERIES each section reads, which the dashboard starts ahead of time
+SECTION_QUERIES = {
+    "Temporal": ["observations_by_date"],
+    "Spatial": ["species_by_location_type", "species_by_plot"],
+    "Species": ["activity_patterns", "sex_ratio"],
+    "Environmental": ["weather_conditions", "sightings_by_disturbance", "species_by_temperature"],
+    "Distance": ["distance_counts", "flyover_counts", "distance_by_species"],
+    "Observer": ["species_by_observer", "species_by_visit"],
+    "Conservation": ["species_by_watchlist_status", "species_by_stewardship_status"],
+}
@@ -0,0 +1,210 @@
+# Headless batch run: load the workbooks, then precompute every EDA aggregate and chart
+# for the unfiltered data, each admin unit and each location type, and write them as
+# static files that a plain web server (or anything reading Parquet) can serve
+#
+#   python BatchReport.py [--output-dir reports] [--workers N] [--load-workers N] [--backend=postgres|duckdb] [--stream] [--skip-load]
+#
+# Output layout:
+#   manifest.json                         data version, run time and the variants
+#   index.html, plotly.min.js             links to every variant's report
+#   <variant>/aggregates/<name>.parquet   one file per AGGREGATE_QUERIES entry
+#   <variant>/report.html                 the dashboard's EDA sections as one static page
+#   <variant>/charts.json                 the same sections with the figures as Plotly JSON
+import argparse
+import html
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import plotly
+import plotly.offline
+
+import Analysis
+import DataProcessing
+from Profiling import stage
+
+OUTPUT_DIR = "reports"
+
+LOCATION_TYPES_QUERY = "SELECT DISTINCT location_type FROM bird_summary_daily WHERE location_type IS NOT NULL ORDER BY 1;"
+
+# Filters of the unfiltered variant; the others set one of them
+NO_FILTERS = {"admin_unit_code": None, "location_type": None, "date_range": None, "disturbance": None}
+
+# Write to a temporary file and swap it in, so a server never sees a partial file
+def write_text(path, text):
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(path + ".tmp", path)
+
+def write_parquet(path, df):
+    df.to_parquet(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+
+# Directory name of a variant, safe on any filesystem
+def variant_slug(kind, value):
+    return f"{kind}-{re.sub(r'[^A-Za-z0-9_.-]', '_', str(value))}" if kind else "all"
+
+# Every variant to precompute: {slug: (title, filters)}
+def list_variants(backend):
+    options = backend.query(Analysis.FILTER_OPTIONS_QUERY).iloc[0]
+    admin_units = list(options["admin_units"]) if options["admin_units"] is not None else []
+    location_types = backend.query(LOCATION_TYPES_QUERY)["location_type"]
+
+    variants = {"all": ("All observations", NO_FILTERS)}
+    for code in admin_units:
+        variants[variant_slug("admin_unit", code)] = (f"Admin unit {code}", {**NO_FILTERS, "admin_unit_code": code})
+    for location_type in location_types:
+        variants[variant_slug("location_type", location_type)] = (f"Location type {location_type}", {**NO_FILTERS, "location_type": location_type})
+    return variants
+
+# Backend of a worker process, of the same kind as the parent's (see init_worker)
+worker_backend = None
+
+def init_worker(backend_name):
+    global worker_backend
+    worker_backend = DataProcessing.create_backend(backend_name)
+
+# Markdown bold (used by the section summaries) to HTML
+def markdown_to_html(text):
+    return re.sub(r"\*\*(.+?)\*\*", r"<strong>\1</strong>", html.escape(text))
+
+def render_html(title, sections):
+    parts = [f"<h1>{html.escape(title)}</h1>"]
+    for name, blocks in sections.items():
+        parts.append(f"<h2>{html.escape(name)}</h2>")
+        for kind, *content in blocks:
+            if kind == "subheader":
+                parts.append(f"<h3>{html.escape(content[0])}</h3>")
+            elif kind == "chart":
+                fig, note = content
+                parts.append(fig.to_html(full_html=False, include_plotlyjs=False))
+                if note:
+                    parts.append(f"<p><em>{html.escape(note)}</em></p>")
+            else:
+                parts.append(f"<p>{markdown_to_html(content[0])}</p>")
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{html.escape(title)}</title>
+<script src="../plotly.min.js"></script></head>
+<body>
+{chr(10).join(parts)}
+</body></html>
+"""
+
+def bundle_json(slug, title, filters, data_version, sections):
+    bundle = {"variant": slug, "title": title, "filters": filters, "data_version": data_version, "sections": {}}
+    for name, blocks in sections.items():
+        bundle["sections"][name] = [
+            {"type": "chart", "figure": content[0].to_plotly_json(), "note": content[1]} if kind == "chart"
+            else {"type": kind, "text": content[0]}
+            for kind, *content in blocks
+        ]
+    return json.dumps(bundle, cls=plotly.utils.PlotlyJSONEncoder)
+
+# Precompute one variant; runs in a worker process. The aggregates are fetched once,
+# written as Parquet and handed to the section builders
+def build_variant(slug, title, filters, data_version, output_dir):
+    start_time = time.perf_counter()
+    variant_dir = os.path.join(output_dir, slug)
+    os.makedirs(os.path.join(variant_dir, "aggregates"), exist_ok=True)
+
+    with stage("batch.variant", variant=slug) as record:
+        aggregates = {}
+        for name in Analysis.AGGREGATE_QUERIES:
+            with stage(f"query.{name}") as query_record:
+                aggregates[name] = worker_backend.query(*Analysis.aggregate_query(name, filters))
+                query_record["rows"] = len(aggregates[name])
+            write_parquet(os.path.join(variant_dir, "aggregates", f"{name}.parquet"), aggregates[name])
+
+        sections = {}
+        for name, build_section in Analysis.EDA_SECTIONS.items():
+            with stage(f"eda.{name.lower()}"):
+                sections[name] = build_section(aggregates.__getitem__)
+
+        write_text(os.path.join(variant_dir, "report.html"), render_html(title, sections))
+        write_text(os.path.join(variant_dir, "charts.json"), bundle_json(slug, title, filters, data_version, sections))
+        record["charts"] = sum(kind == "chart" for blocks in sections.values() for kind, *_ in blocks)
+
+    return time.perf_counter() - start_time
+
+def write_index(output_dir, variants, data_version, built):
+    links = "\n".join(
+        f'<li><a href="{slug}/report.html">{html.escape(title)}</a> (<a href="{slug}/charts.json">JSON</a>)</li>'
+        for slug, (title, _) in variants.items() if slug in built
+    )
+    write_text(os.path.join(output_dir, "index.html"), f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Bird Species Observation Analysis</title></head>
+<body>
+<h1>Bird Species Observation Analysis</h1>
+<p>Precomputed from data version {data_version} on {time.strftime("%Y-%m-%d %H:%M:%S")}.</p>
+<ul>
+{links}
+</ul>
+</body></html>
+""")
+
+    manifest = {
+        "data_version": data_version,
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "variants": {slug: {"title": title, "filters": filters} for slug, (title, filters) in variants.items() if slug in built},
+    }
+    write_text(os.path.join(output_dir, "manifest.json"), json.dumps(manifest, indent=2))
+
+def run(args):
+    backend = DataProcessing.create_backend(args.backend)
+
+    if not args.skip_load:
+        if args.stream:
+            backend.store_stream(incremental=True)
+        else:
+            backend.store(DataProcessing.load_and_clean_data(workers=args.load_workers), incremental=True)
+        print(f"Data loaded into {backend.name}")
+
+    data_version = backend.data_version()
+    variants = list_variants(backend)
+    os.makedirs(args.output_dir, exist_ok=True)
+    write_text(os.path.join(args.output_dir, "plotly.min.js"), plotly.offline.get_plotlyjs())
+    print(f"Building {len(variants)} variants on {args.workers or os.cpu_count()} workers")
+
+    # Workers are spawned rather than forked so none of them inherits the parent's
+    # database connections
+    built, failed = set(), []
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context, initializer=init_worker, initargs=(args.backend or DataProcessing.BACKEND,)) as pool:
+        futures = {
+            pool.submit(build_variant, slug, title, filters, data_version, args.output_dir): slug
+            for slug, (title, filters) in variants.items()
+        }
+        for future in as_completed(futures):
+            slug = futures[future]
+            try:
+                seconds = future.result()
+            except Exception as e:
+                failed.append(slug)
+                print(f"{slug}: failed: {e}")
+                continue
+            built.add(slug)
+            print(f"{slug}: {seconds:.2f}s")
+
+    write_index(args.output_dir, variants, data_version, built)
+    print(f"Wrote {len(built)} variants to {args.output_dir}")
+    return failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the EDA aggregates and charts as static files")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help=f"where the reports are written (default: {OUTPUT_DIR})")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--load-workers", type=int, default=1, help="processes parsing the workbooks (default: 1)")
+    parser.add_argument("--backend", choices=sorted(DataProcessing.BACKENDS), default=None, help="storage backend (default: BIRD_BACKEND)")
+    parser.add_argument("--stream", action="store_true", help="load the workbooks in streaming mode")
+    parser.add_argument("--skip-load", action="store_true", help="use the data already in the backend")
+    args = parser.parse_args()
+
+    with stage("batch"):
+        failed = run(args)
+    if failed:
+        print(f"{len(failed)} variants failed: {', '.join(sorted(failed))}")
+        sys.exit(1)
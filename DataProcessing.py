@@ -1,149 +1,1330 @@
 # data_preprocessing.py
+import contextlib
+import hashlib
+import io
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+
+import duckdb
+import numpy as np
+import openpyxl
 import pandas as pd
 import psycopg2
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pandas.io.parsers import TextParser
 from psycopg2 import sql
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
 
-# Step 1: Load and Clean Data
-def load_and_clean_data():
-    # Read both Excel files 
-    forest_sheets = pd.read_excel('Bird_Monitoring_Data_FOREST.xlsx', sheet_name=None)
-    grassland_sheets = pd.read_excel('Bird_Monitoring_Data_GRASSLAND.xlsx', sheet_name=None)
+from Profiling import profile, stage
+
+# Columns stored in bird_observations, in table order
+OBSERVATION_COLUMNS = [
+    'Admin_Unit_Code', 'Location_Type', 'Interval_Length', 'ID_Method', 'Year', 'Month', 'Date', 
+    'Scientific_Name', 'Common_Name', 'Temperature', 'Humidity', 'Distance', 'Flyover_Observed', 
+    'Sex', 'PIF_Watchlist_Status', 'Regional_Stewardship_Status', 'Disturbance', 'Plot_Name', 
+    'Sky', 'Wind', 'Observer', 'Visit'  # Added Observer and Visit
+]
+
+# Workbook and sheet each observation was read from, used for incremental loads
+SOURCE_COLUMNS = ['Source_Workbook', 'Source_Sheet']
+TABLE_COLUMNS = OBSERVATION_COLUMNS + SOURCE_COLUMNS
+
+# Source workbooks, one per habitat
+WORKBOOKS = ['Bird_Monitoring_Data_FOREST.XLSX', 'Bird_Monitoring_Data_GRASSLAND.XLSX']
+
+# Cleaned per-workbook data is cached here as Parquet; bump CACHE_VERSION whenever
+# the cleaning steps change so stale entries are rebuilt
+CACHE_DIR = '.cache'
+CACHE_VERSION = 3
+
+# Pre-aggregated tables the dashboard reads instead of bird_observations. Each one is
+# grouped by the dashboard's filter columns plus its own columns, and stores the
+# number of observations (and of rows with a scientific name) per group
+SUMMARY_FILTER_COLUMNS = ['admin_unit_code', 'location_type', 'date', 'disturbance']
+SUMMARY_TABLES = {
+    'bird_summary_daily': [],
+    'bird_summary_activity': ['interval_length', 'id_method'],
+    'bird_summary_weather': ['temperature', 'humidity', 'sky', 'wind'],
+    'bird_summary_flyover': ['flyover_observed'],
+    'bird_summary_distance_species': ['distance', 'scientific_name'],
+    'bird_summary_sex_species': ['scientific_name', 'sex'],
+    'bird_summary_species': ['scientific_name', 'pif_watchlist_status', 'regional_stewardship_status'],
+    'bird_summary_plot_species': ['plot_name', 'scientific_name'],
+    'bird_summary_observer_species': ['observer', 'scientific_name'],
+    'bird_summary_visit_species': ['visit', 'scientific_name'],
+    'bird_summary_temperature_species': ['temperature', 'scientific_name'],
+}
+
+# Storage backend used by the loader and the dashboard: "postgres" or "duckdb"
+# (see create_backend); set BIRD_BACKEND to choose
+BACKEND = os.environ.get("BIRD_BACKEND", "postgres")
+
+# The DuckDB backend keeps the observations and summary tables as Parquet files here
+WAREHOUSE_DIR = os.environ.get("BIRD_WAREHOUSE_DIR", "warehouse")
+
+# Connections kept open per dashboard server process by the PostgreSQL backend, and
+# how long a query waits for a free one before failing
+POOL_MIN_CONNECTIONS = 1
+POOL_MAX_CONNECTIONS = 10
+POOL_WAIT_SECONDS = 30
+
+# Rows sent to PostgreSQL per COPY / execute_values round trip
+DEFAULT_BATCH_SIZE = 10000
 
-    # Filter out empty sheets
-    forest_dfs = [df for df in forest_sheets.values() if not df.empty]
-    grassland_dfs = [df for df in grassland_sheets.values() if not df.empty]
+# Rows held in memory at a time in streaming mode (see stream_data_to_postgres)
+DEFAULT_CHUNK_SIZE = 50000
 
-    # Check if any data is available before concatenation
-    forest_df = pd.concat(forest_dfs, ignore_index=True) if forest_dfs else pd.DataFrame()
-    grassland_df = pd.concat(grassland_dfs, ignore_index=True) if grassland_dfs else pd.DataFrame()
+# Columns whose missing values are replaced by the mean over all observations
+IMPUTED_COLUMNS = ['Temperature', 'Humidity']
 
-    # Merge both datasets
-    combined_df = pd.concat([forest_df, grassland_df], ignore_index=True)
+# Arrow types of the cleaned columns, so that every chunk written to a streamed cache
+# file has the same schema; columns not listed are text
+CACHE_TYPES = {
+    'Interval_Length': pa.dictionary(pa.int8(), pa.string()),
+    'Year': pa.int32(), 'Month': pa.int32(), 'Date': pa.timestamp('us'),
+    'Temperature': pa.float64(), 'Humidity': pa.float64(), 'Visit': pa.int64(),
+    'Flyover_Observed': pa.bool_(), 'PIF_Watchlist_Status': pa.bool_(), 'Regional_Stewardship_Status': pa.bool_(),
+}
+CACHE_SCHEMA = pa.schema([(col, CACHE_TYPES.get(col, pa.string())) for col in TABLE_COLUMNS])
+TEXT_COLUMNS = [col for col in TABLE_COLUMNS if col not in CACHE_TYPES]
 
-    # If no data is available, return an empty DataFrame
-    if combined_df.empty:
-        raise ValueError("No valid data found in the Excel sheets.")
+# Interval buckets as (upper bound, label); lengths above the last bound, or
+# negative ones, fall into '10+ min' and unparseable lengths become 'Unknown'
+INTERVAL_BINS = [0, 2.5, 5, 7.5, 10]
+INTERVAL_LABELS = ['0-2.5 min', '2.5-5 min', '5-7.5 min', '7.5-10 min']
+INTERVAL_DTYPE = pd.CategoricalDtype(INTERVAL_LABELS + ['10+ min', 'Unknown'])
 
-    # Drop rows where 'Scientific_Name' is missing
-    combined_df = combined_df.dropna(subset=['Scientific_Name'])
+# Low-cardinality text columns stored as pandas categoricals
+CATEGORICAL_COLUMNS = ['Location_Type', 'Interval_Length', 'ID_Method', 'Distance', 'Sex', 'Sky', 'Wind']
 
+# Bucket interval lengths. There are only a handful of distinct raw values, so each
+# one is parsed and binned once and the buckets are mapped back onto the rows
+def categorize_intervals(intervals):
+    codes, uniques = pd.factorize(intervals)
 
-    # Fix: Avoid inplace=True with chained assignment
-    combined_df['Temperature'] = combined_df['Temperature'].fillna(combined_df['Temperature'].mean())  # Fill missing temperature with mean
-    combined_df['Humidity'] = combined_df['Humidity'].fillna(combined_df['Humidity'].mean())  # Fill missing humidity with mean
+    # Convert to numeric, errors='coerce' turns invalid parsing into NaN
+    length = pd.to_numeric(pd.Series(uniques), errors='coerce')
+    buckets = pd.cut(length, bins=INTERVAL_BINS, labels=INTERVAL_LABELS, include_lowest=True).astype(INTERVAL_DTYPE)
+    buckets[buckets.isna() & length.notna()] = '10+ min'
+    buckets = buckets.fillna('Unknown')
+
+    # Missing values have code -1 and map to 'Unknown'
+    bucket_codes = np.append(buckets.cat.codes.to_numpy(), INTERVAL_DTYPE.categories.get_loc('Unknown'))
+    return pd.Series(pd.Categorical.from_codes(bucket_codes[codes], dtype=INTERVAL_DTYPE), index=intervals.index)
+
+# Clean one habitat's observations. Every step here works row by row, so each
+# workbook can be cleaned (and cached) on its own before the datasets are merged
+def clean_observations(df):
+    # Drop rows where 'Scientific_Name' is missing and keep only the columns we store,
+    # in a single copy ('Month' is derived below)
+    source_columns = [col for col in OBSERVATION_COLUMNS if col != 'Month']
+    source_columns += [col for col in SOURCE_COLUMNS if col in df.columns]
+    df = df.loc[df['Scientific_Name'].notna(), source_columns]
 
     # Standardize data
-    combined_df['Date'] = pd.to_datetime(combined_df['Date'])  # Convert to datetime
-    combined_df['Year'] = combined_df['Date'].dt.year  # Extract year
-    combined_df['Month'] = combined_df['Date'].dt.month  # Extract month
-
-    # Convert 'Interval_Length' to numeric, errors='coerce' turns invalid parsing into NaN
-    combined_df['Interval_Length'] = pd.to_numeric(combined_df['Interval_Length'], errors='coerce')
-
-    def categorize_interval(length):
-        if pd.isnull(length):
-            return 'Unknown'
-        elif 0 <= length <= 2.5:
-            return '0-2.5 min'
-        elif 2.5 < length <= 5:
-            return '2.5-5 min'
-        elif 5 < length <= 7.5:
-            return '5-7.5 min'
-        elif 7.5 < length <= 10:
-            return '7.5-10 min'
-        else:
-            return '10+ min'
-        
-    # Apply categorization to 'Interval_Length'
-    combined_df['Interval_Length'] = combined_df['Interval_Length'].apply(categorize_interval)
+    dates = df['Date']
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates)  # Convert to datetime
+        df['Date'] = dates
+    df['Year'] = dates.dt.year  # Extract year
+    df.insert(OBSERVATION_COLUMNS.index('Month'), 'Month', dates.dt.month)  # Extract month
+
+    df['Interval_Length'] = categorize_intervals(df['Interval_Length'])
 
     # Handle 'Sky' and 'Wind' columns: Clean, categorize or map values if needed
-    combined_df['Sky'] = combined_df['Sky'].fillna('Unknown')  # Handle missing sky data
-    combined_df['Wind'] = combined_df['Wind'].fillna('Unknown')  # Handle missing wind data
-
-    # Filter relevant columns
-    columns_to_keep = [
-        'Admin_Unit_Code', 'Location_Type', 'Interval_Length', 'ID_Method', 'Year', 'Month', 'Date', 
-        'Scientific_Name', 'Common_Name', 'Temperature', 'Humidity', 'Distance', 'Flyover_Observed', 
-        'Sex', 'PIF_Watchlist_Status', 'Regional_Stewardship_Status', 'Disturbance', 'Plot_Name', 
-        'Sky', 'Wind', 'Observer', 'Visit'  # Added Observer and Visit
-    ]
-    combined_df = combined_df[columns_to_keep]
+    df['Sky'] = df['Sky'].fillna('Unknown')  # Handle missing sky data
+    df['Wind'] = df['Wind'].fillna('Unknown')  # Handle missing wind data
+
+    return df
+
+# Concatenate a workbook's non-empty sheets, tag each row with the sheet it came
+# from and clean the result in one pass (per-sheet cleaning has a high fixed cost)
+def clean_sheets(path, sheets):
+    names = [name for name, df in sheets.items() if not df.empty]
+    if not names:
+        return pd.DataFrame(columns=TABLE_COLUMNS)
+
+    df = pd.concat([sheets[name] for name in names], ignore_index=True)
+    df['Source_Workbook'] = os.path.basename(path)
+    df['Source_Sheet'] = np.repeat(names, [len(sheets[name]) for name in names])
+    return clean_observations(df)
+
+# Parse and clean sheets as separate stages
+def parse_and_clean(path, sheet_name):
+    workbook = os.path.basename(path)
+    with stage("load.excel_parse", workbook=workbook, sheet=sheet_name) as record:
+        sheets = pd.read_excel(path, sheet_name=sheet_name)
+        if sheet_name is not None:
+            sheets = {sheet_name: sheets}
+        record["rows"] = sum(len(df) for df in sheets.values())
+    with stage("load.clean", workbook=workbook, sheet=sheet_name) as record:
+        df = clean_sheets(path, sheets)
+        record["rows"] = len(df)
+    return df
+
+# Read and clean a single sheet; runs inside a worker process in parallel mode
+def read_sheet(path, sheet_name):
+    return parse_and_clean(path, sheet_name)
+
+# Read every non-empty sheet of a workbook and clean them together
+def read_workbook(path):
+    return parse_and_clean(path, None)
+
+# Parse several workbooks. With workers > 1 (or None for one per CPU) every sheet of
+# every workbook is parsed and cleaned in its own task on a process pool; sheets are
+# still concatenated in workbook order, and cleaning is row by row, so once the merge
+# normalizes the categorical columns the result matches the serial path exactly
+def read_workbooks(paths, workers=1):
+    if workers == 1:
+        return {path: read_workbook(path) for path in paths}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for path in paths:
+            with pd.ExcelFile(path) as workbook:
+                sheet_names = workbook.sheet_names
+            futures[path] = [pool.submit(read_sheet, path, name) for name in sheet_names]
+        frames = {}
+        for path, sheet_futures in futures.items():
+            dfs = [f.result() for f in sheet_futures]
+            frames[path] = pd.concat([df for df in dfs if not df.empty] or dfs, ignore_index=True)
+        return frames
+
+# Same conversion read_excel applies to openpyxl cells: empty cells become "" (read
+# as NaN by the parser) and integral floats become ints
+def convert_cell(value):
+    if value is None:
+        return ""
+    if type(value) is float and value.is_integer():
+        return int(value)
+    return value
+
+# Stream a workbook one chunk of rows at a time with openpyxl's read-only mode,
+# yielding (sheet name, DataFrame) pairs. Rows go through the same parser as
+# read_excel, so the chunks hold the same values read_workbook would see
+def iter_sheet_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            header = [convert_cell(value) for value in header]
+            while header and header[-1] == "":
+                header.pop()
+
+            while True:
+                block = [[convert_cell(value) for value in row[:len(header)]] for row in itertools.islice(rows, chunk_size)]
+                if not block:
+                    break
+                block = [row + [""] * (len(header) - len(row)) for row in block]
+                yield sheet.title, TextParser([header] + block, header=0, skip_blank_lines=False).read()
+    finally:
+        workbook.close()
+
+# Stream a workbook's cleaned observations into its Parquet cache file, one row
+# group per chunk, so memory use depends on chunk_size rather than workbook size
+def stream_workbook_to_cache(path, fingerprint, cache_dir=CACHE_DIR, chunk_size=DEFAULT_CHUNK_SIZE):
+    data_path, _ = cache_paths(path, cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    row_count = 0
+    with stage("stream.cache_write", workbook=os.path.basename(path)) as record, pq.ParquetWriter(data_path, CACHE_SCHEMA) as writer:
+        for sheet_name, chunk in iter_sheet_chunks(path, chunk_size):
+            df = clean_sheets(path, {sheet_name: chunk})
+            if not df.empty:
+                writer.write_table(pa.Table.from_pandas(text_columns_as_str(df[TABLE_COLUMNS]), schema=CACHE_SCHEMA, preserve_index=False))
+                row_count += len(df)
+        record["rows"] = row_count
+
+    write_cache_manifest(path, fingerprint, cache_dir)
+    return row_count
+
+# The parser infers types chunk by chunk, so a text column whose values all look
+# numeric (e.g. numeric plot codes) comes back as numbers. Convert the text columns
+# to str, keeping missing values, so every chunk matches CACHE_SCHEMA
+def text_columns_as_str(df):
+    df = df.copy()
+    for col in TEXT_COLUMNS:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype) and values.cat.categories.dtype == object:
+            continue
+        values = values.astype(object)
+        df[col] = values.where(values.isna(), values.astype(str))
+    return df
+
+# Size, modification time and content hash of a source workbook
+def workbook_fingerprint(path):
+    stat = os.stat(path)
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha256.update(block)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256.hexdigest()}
+
+def cache_paths(path, cache_dir):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f"{stem}.parquet"), os.path.join(cache_dir, f"{stem}.json")
+
+def write_cache_manifest(path, fingerprint, cache_dir=CACHE_DIR):
+    _, manifest_path = cache_paths(path, cache_dir)
+    with open(manifest_path, 'w') as f:
+        json.dump({'version': CACHE_VERSION, **fingerprint}, f)
+
+# Whether a workbook's cache entry is up to date, and the fingerprint to store
+# alongside a rebuilt entry. The file is hashed at most once
+def cache_status(path, cache_dir=CACHE_DIR):
+    data_path, manifest_path = cache_paths(path, cache_dir)
+
+    manifest = None
+    if os.path.exists(manifest_path) and os.path.exists(data_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    if not manifest or manifest.get('version') != CACHE_VERSION:
+        return False, workbook_fingerprint(path)
+
+    # Unchanged size and mtime: trust the cache without re-hashing the file
+    stat = os.stat(path)
+    if manifest['size'] == stat.st_size and manifest['mtime_ns'] == stat.st_mtime_ns:
+        return True, manifest
+
+    # Touched but identical content: refresh the manifest and reuse the data
+    fingerprint = workbook_fingerprint(path)
+    if fingerprint['sha256'] == manifest['sha256']:
+        write_cache_manifest(path, fingerprint, cache_dir)
+        return True, fingerprint
+    return False, fingerprint
+
+# Look up a workbook's cleaned observations in the Parquet cache. Returns the cached
+# frame (None when the workbook or the cleaning code has changed) and the fingerprint
+# to store alongside a rebuilt entry
+def read_cached_workbook(path, cache_dir=CACHE_DIR):
+    fresh, fingerprint = cache_status(path, cache_dir)
+    if not fresh:
+        return None, fingerprint
+    return pd.read_parquet(cache_paths(path, cache_dir)[0]), fingerprint
+
+# Text columns are written as text (see text_columns_as_str); Parquet cannot store a
+# column that mixes numbers and strings
+def write_cached_workbook(path, df, fingerprint, cache_dir=CACHE_DIR):
+    data_path, _ = cache_paths(path, cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    text_columns_as_str(df).to_parquet(data_path, index=False)
+    write_cache_manifest(path, fingerprint, cache_dir)
+
+# Make sure every workbook has an up-to-date cache file, streaming the stale ones
+# in from Excel; returns the cache file paths in workbook order
+def stream_workbooks_to_cache(workbooks=WORKBOOKS, cache_dir=CACHE_DIR, chunk_size=DEFAULT_CHUNK_SIZE):
+    data_paths = []
+    for path in workbooks:
+        fresh, fingerprint = cache_status(path, cache_dir)
+        if fresh:
+            print(f"{path}: warm (cached)")
+        else:
+            start_time = time.perf_counter()
+            row_count = stream_workbook_to_cache(path, fingerprint, cache_dir, chunk_size)
+            print(f"{path}: cold (streamed {row_count} rows) in {time.perf_counter() - start_time:.2f}s")
+        data_paths.append(cache_paths(path, cache_dir)[0])
+    return data_paths
+
+# Read cache files back one chunk at a time, as (workbook path, DataFrame) pairs
+def iter_cached_chunks(data_paths, chunk_size=DEFAULT_CHUNK_SIZE, columns=None):
+    for data_path in data_paths:
+        for batch in pq.ParquetFile(data_path).iter_batches(batch_size=chunk_size, columns=columns):
+            yield data_path, batch.to_pandas()
 
+# Mean of the non-missing values in a sequence of arrays, from their exact total rounded
+# once. Unlike a running float sum, the result does not depend on how the values are
+# split into chunks, so the in-memory and streaming loads impute the same value.
+# np.frexp splits each value into a mantissa, scaled here to a 53-bit integer, and an
+# exponent; the integers are summed per exponent in two 26-bit halves with np.bincount.
+# Those float64 sums stay below 2**53 for EXACT_MEAN_SLICE values, so they are exact
+EXACT_MEAN_SLICE = 2 ** 18
+
+def exact_mean(arrays):
+    total, count = Fraction(0), 0
+    for array in arrays:
+        for start in range(0, len(array), EXACT_MEAN_SLICE):
+            values = array[start:start + EXACT_MEAN_SLICE]
+            values = values[~np.isnan(values)]
+            if not len(values):
+                continue
+            mantissas, exponents = np.frexp(values)
+            mantissas = (mantissas * 2.0 ** 53).astype(np.int64)
+            low_exponent = exponents.min()
+            bins = exponents - low_exponent
+            high = np.bincount(bins, weights=mantissas >> 26)
+            low = np.bincount(bins, weights=mantissas & (2 ** 26 - 1))
+            scaled = sum(((int(h) << 26) + int(l)) << shift for shift, (h, l) in enumerate(zip(high, low)))
+            total += Fraction(scaled) * Fraction(2) ** (int(low_exponent) - 53)
+            count += len(values)
+    return float(total) / count if count else np.nan
+
+# First pass of streaming mode: the mean of each imputed column over every cached
+# observation, reading one column at a time
+def running_means(data_paths, chunk_size=DEFAULT_CHUNK_SIZE):
+    with stage("stream.means"):
+        return {
+            col: exact_mean(chunk[col].to_numpy(dtype=float) for _, chunk in iter_cached_chunks(data_paths, chunk_size, [col]))
+            for col in IMPUTED_COLUMNS
+        }
+
+# Merge the cleaned workbooks and impute missing weather readings
+def merge_workbooks(dfs):
+    # Categories differ between sheets, so the low-cardinality columns are converted
+    # once here rather than per sheet (concat would undo it)
+    combined_df = pd.concat(dfs, ignore_index=True)
+    combined_df = combined_df.astype({col: 'category' for col in CATEGORICAL_COLUMNS})
+
+    # The means are taken over the merged data, so imputation happens after the merge
+    combined_df['Temperature'] = combined_df['Temperature'].fillna(exact_mean([combined_df['Temperature'].to_numpy(dtype=float)]))  # Fill missing temperature with mean
+    combined_df['Humidity'] = combined_df['Humidity'].fillna(exact_mean([combined_df['Humidity'].to_numpy(dtype=float)]))  # Fill missing humidity with mean
+    return combined_df
+
+# Step 1: Load and Clean Data
+def load_and_clean_data(workbooks=WORKBOOKS, use_cache=True, cache_dir=CACHE_DIR, workers=1):
+    start_time = time.perf_counter()
+
+    with stage("load") as load_record:
+        # Reuse cached, cleaned copies of workbooks that have not changed
+        frames, fingerprints = {}, {}
+        for path in workbooks:
+            if use_cache:
+                with stage("load.cache_read", workbook=os.path.basename(path)) as record:
+                    frames[path], fingerprints[path] = read_cached_workbook(path, cache_dir)
+                    record["hit"] = frames[path] is not None
+                    record["rows"] = len(frames[path]) if frames[path] is not None else 0
+                if frames[path] is not None:
+                    print(f"{path}: warm (cached)")
+            else:
+                frames[path] = None
+
+        # Parse the remaining Excel files
+        stale = [path for path in workbooks if frames[path] is None]
+        if stale:
+            parse_start = time.perf_counter()
+            for path, df in read_workbooks(stale, workers).items():
+                frames[path] = df
+                if use_cache:
+                    with stage("load.cache_write", workbook=os.path.basename(path), rows=len(df)):
+                        write_cached_workbook(path, df, fingerprints[path], cache_dir)
+            print(f"{', '.join(stale)}: cold (parsed) in {time.perf_counter() - parse_start:.2f}s")
+
+        dfs = [frames[path] for path in workbooks if not frames[path].empty]
+
+        # If no data is available, raise an error
+        if not dfs:
+            raise ValueError("No valid data found in the Excel sheets.")
+
+        with stage("load.merge") as record:
+            combined_df = merge_workbooks(dfs)
+            record["rows"] = len(combined_df)
+        load_record["rows"] = len(combined_df)
+
+    print(f"Loaded {len(combined_df)} observations in {time.perf_counter() - start_time:.2f}s")
     return combined_df
 
 # Step 2: Connect to PostgreSQL Database
+# Replace with your PostgreSQL credentials
+POSTGRES_SETTINGS = {
+    "dbname": "bird_db",
+    "user": "postgres",
+    "password": "Phani@1pk",
+    "host": "localhost",
+    "port": "5432",
+}
+
 def connect_to_postgres():
-    # Replace with your PostgreSQL credentials
-    conn = psycopg2.connect(
-        dbname="bird_db",
-        user="postgres",
-        password="Phani@1pk",
-        host="localhost",
-        port="5432"
-    )
+    conn = psycopg2.connect(**POSTGRES_SETTINGS)
     return conn
 
-# Step 3: Store Data in PostgreSQL
-def store_data_in_postgres(df):
-    conn = connect_to_postgres()
-    cursor = conn.cursor()
+# Columns stored as integers in the staging table
+INTEGER_COLUMNS = ['Year', 'Month', 'Visit']
+
+# Stream rows into a table with COPY FROM STDIN, one CSV buffer per batch
+def copy_rows(cursor, df, table="bird_observations_staging", batch_size=DEFAULT_BATCH_SIZE):
+    copy_query = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(
+        sql.Identifier(table),
+        sql.SQL(', ').join(sql.Identifier(col.lower()) for col in TABLE_COLUMNS)
+    )
+    df = df[TABLE_COLUMNS]
+    # A missing value turns an integer column into floats, which COPY would reject as
+    # "2018.0"; round them as INSERT does
+    floats = [col for col in INTEGER_COLUMNS if pd.api.types.is_float_dtype(df[col])]
+    if floats:
+        df = df.round({col: 0 for col in floats}).astype({col: 'Int64' for col in floats})
+    for start in range(0, len(df), batch_size):
+        buffer = io.StringIO()
+        # Missing values are written as unquoted empty fields, which COPY reads as NULL
+        df.iloc[start:start + batch_size].to_csv(buffer, header=False, index=False)
+        buffer.seek(0)
+        cursor.copy_expert(copy_query, buffer)
+
+# Fallback for servers/poolers without COPY support: multi-row INSERTs via execute_values
+def insert_rows(cursor, df, table="bird_observations_staging", batch_size=DEFAULT_BATCH_SIZE):
+    insert_query = sql.SQL("INSERT INTO {} ({}) VALUES %s").format(
+        sql.Identifier(table),
+        sql.SQL(', ').join(sql.Identifier(col.lower()) for col in TABLE_COLUMNS)
+    )
+    # Convert numpy scalars to Python objects and NaN/NaT to None so psycopg2 can adapt them
+    df = df[TABLE_COLUMNS]
+    records = df.astype(object).where(df.notna(), None)
+    rows = records.itertuples(index=False, name=None)
+    execute_values(cursor, insert_query.as_string(cursor), rows, page_size=batch_size)
+
+# Bulk insert rows with the chosen method
+def write_rows(cursor, df, table="bird_observations_staging", method="copy", batch_size=DEFAULT_BATCH_SIZE):
+    if method == "copy":
+        copy_rows(cursor, df, table, batch_size)
+    elif method == "execute_values":
+        insert_rows(cursor, df, table, batch_size)
+    else:
+        raise ValueError(f"Unknown load method: {method}")
+
+def report_throughput(row_count, method, start_time):
+    elapsed = time.perf_counter() - start_time
+    rows_per_second = row_count / elapsed if elapsed > 0 else float('inf')
+    print(f"Loaded {row_count} rows with {method} in {elapsed:.2f}s ({rows_per_second:,.0f} rows/s)")
+
+# Bulk insert rows with the chosen method, reporting throughput
+def load_rows(cursor, df, table="bird_observations_staging", method="copy", batch_size=DEFAULT_BATCH_SIZE):
+    start_time = time.perf_counter()
+    with stage("store.stage_rows", method=method, rows=len(df)):
+        write_rows(cursor, df, table, method, batch_size)
+    report_throughput(len(df), method, start_time)
+
+# Version of the bird_observations view definition below, stored as the view's
+# comment; bump it whenever the definition changes
+OBSERVATIONS_VIEW_VERSION = 1
+
+# Create the production schema if it does not exist yet:
+#   - dimension tables for admin units, plots, species and observers, keyed by
+#     surrogate ids
+#   - bird_observation_facts, range-partitioned by month on Date, with indexes on
+#     the dashboard's filter columns (created on every partition automatically);
+#     rows without a date go to the default partition
+#   - the bird_observations view, which joins them back into the original flat
+#     layout (Year and Month are derived from Date rather than stored)
+# Replacing a view locks its readers out until the commit, so the view is only
+# (re)created when it is missing or its version changed, and the loaders commit the
+# schema before they start loading
+def create_schema(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS bird_admin_units (
+        Admin_Unit_Id SERIAL PRIMARY KEY,
+        Admin_Unit_Code TEXT NOT NULL UNIQUE
+    );
+
+    CREATE TABLE IF NOT EXISTS bird_plots (
+        Plot_Id SERIAL PRIMARY KEY,
+        Plot_Name TEXT NOT NULL UNIQUE,
+        Admin_Unit_Id INT REFERENCES bird_admin_units
+    );
+
+    CREATE TABLE IF NOT EXISTS bird_species (
+        Species_Id SERIAL PRIMARY KEY,
+        Scientific_Name TEXT NOT NULL UNIQUE,
+        Common_Name TEXT,
+        PIF_Watchlist_Status BOOLEAN,
+        Regional_Stewardship_Status BOOLEAN
+    );
+
+    CREATE TABLE IF NOT EXISTS bird_observers (
+        Observer_Id SERIAL PRIMARY KEY,
+        Observer TEXT NOT NULL UNIQUE
+    );
+
+    CREATE TABLE IF NOT EXISTS bird_observation_facts (
+        Observation_Id BIGINT GENERATED ALWAYS AS IDENTITY,
+        Date DATE,
+        Admin_Unit_Id INT REFERENCES bird_admin_units,
+        Plot_Id INT REFERENCES bird_plots,
+        Species_Id INT NOT NULL REFERENCES bird_species,
+        Observer_Id INT REFERENCES bird_observers,
+        Location_Type TEXT,
+        Interval_Length TEXT,
+        ID_Method TEXT,
+        Temperature DOUBLE PRECISION,
+        Humidity DOUBLE PRECISION,
+        Distance TEXT,
+        Flyover_Observed BOOLEAN,
+        Sex TEXT,
+        Disturbance TEXT,
+        Sky TEXT,
+        Wind TEXT,
+        Visit SMALLINT,
+        Source_Workbook TEXT,
+        Source_Sheet TEXT,
+        UNIQUE (Date, Observation_Id)
+    ) PARTITION BY RANGE (Date);
+    """)
+    allow_undated_facts(cursor)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS bird_observation_facts_undated PARTITION OF bird_observation_facts DEFAULT;
+
+    CREATE INDEX IF NOT EXISTS bird_observation_facts_admin_unit_idx ON bird_observation_facts (Admin_Unit_Id, Date);
+    CREATE INDEX IF NOT EXISTS bird_observation_facts_location_type_idx ON bird_observation_facts (Location_Type, Date);
+    CREATE INDEX IF NOT EXISTS bird_observation_facts_disturbance_idx ON bird_observation_facts (Disturbance);
+    CREATE INDEX IF NOT EXISTS bird_observation_facts_species_idx ON bird_observation_facts (Species_Id);
+    CREATE INDEX IF NOT EXISTS bird_observation_facts_plot_idx ON bird_observation_facts (Plot_Id);
+    CREATE INDEX IF NOT EXISTS bird_observation_facts_observer_idx ON bird_observation_facts (Observer_Id);
+    CREATE INDEX IF NOT EXISTS bird_observation_facts_source_idx ON bird_observation_facts (Source_Workbook, Source_Sheet);
+    """)
+
+    cursor.execute("SELECT obj_description(to_regclass('bird_observations'), 'pg_class');")
+    if cursor.fetchone()[0] == f"version {OBSERVATIONS_VIEW_VERSION}":
+        return
+    cursor.execute("""
+    CREATE OR REPLACE VIEW bird_observations AS
+    SELECT
+        a.Admin_Unit_Code,
+        f.Location_Type,
+        f.Interval_Length,
+        f.ID_Method,
+        EXTRACT(YEAR FROM f.Date)::INT AS Year,
+        EXTRACT(MONTH FROM f.Date)::INT AS Month,
+        f.Date,
+        s.Scientific_Name,
+        s.Common_Name,
+        f.Temperature,
+        f.Humidity,
+        f.Distance,
+        f.Flyover_Observed,
+        f.Sex,
+        s.PIF_Watchlist_Status,
+        s.Regional_Stewardship_Status,
+        f.Disturbance,
+        p.Plot_Name,
+        f.Sky,
+        f.Wind,
+        o.Observer,
+        f.Visit,
+        f.Source_Workbook,
+        f.Source_Sheet
+    FROM bird_observation_facts f
+    JOIN bird_species s USING (Species_Id)
+    LEFT JOIN bird_admin_units a USING (Admin_Unit_Id)
+    LEFT JOIN bird_plots p USING (Plot_Id)
+    LEFT JOIN bird_observers o USING (Observer_Id);
+    """)
+    cursor.execute(sql.SQL("COMMENT ON VIEW bird_observations IS {};").format(sql.Literal(f"version {OBSERVATIONS_VIEW_VERSION}")))
+
+# Databases created before rows without a date were accepted have Date NOT NULL, as
+# part of the primary key; the key becomes a unique constraint, which allows NULLs
+def allow_undated_facts(cursor):
+    cursor.execute("SELECT attnotnull FROM pg_attribute WHERE attrelid = 'bird_observation_facts'::regclass AND attname = 'date';")
+    if cursor.fetchone()[0]:
+        cursor.execute("""
+        ALTER TABLE bird_observation_facts DROP CONSTRAINT bird_observation_facts_pkey;
+        ALTER TABLE bird_observation_facts ALTER COLUMN Date DROP NOT NULL;
+        ALTER TABLE bird_observation_facts ADD UNIQUE (Date, Observation_Id);
+        """)
+
+# Databases loaded before the partitioned schema have bird_observations as a plain
+# table; drop it (and its per-sheet digests) so the next load is a full one
+def drop_legacy_table(cursor):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('bird_observations');")
+    row = cursor.fetchone()
+    if row and row[0] == 'r':
+        cursor.execute("DROP TABLE bird_observations CASCADE;")
+        cursor.execute("DROP TABLE IF EXISTS bird_observation_sources;")
+        print("Dropped the legacy bird_observations table")
 
-    # Drop the existing table if it exists
-    drop_table_query = "DROP TABLE IF EXISTS bird_observations;"
-    cursor.execute(drop_table_query)
-    conn.commit()
-
-    # Create the table with the new columns 'Observer' and 'Visit'
-    create_table_query = """
-    CREATE TABLE bird_observations (
-        Admin_Unit_Code VARCHAR(50),
-        Location_Type VARCHAR(50),
-        Interval_Length VARCHAR(50),
-        ID_Method VARCHAR(50),
+# Flat staging table in the loader's column layout; dropped at commit
+def create_staging_table(cursor):
+    cursor.execute("""
+    CREATE TEMP TABLE bird_observations_staging (
+        Admin_Unit_Code TEXT,
+        Location_Type TEXT,
+        Interval_Length TEXT,
+        ID_Method TEXT,
         Year INT,
         Month INT,
         Date DATE,
-        Scientific_Name VARCHAR(100),
-        Common_Name VARCHAR(100),
-        Temperature FLOAT,
-        Humidity FLOAT,
-        Distance VARCHAR(50),
+        Scientific_Name TEXT,
+        Common_Name TEXT,
+        Temperature DOUBLE PRECISION,
+        Humidity DOUBLE PRECISION,
+        Distance TEXT,
         Flyover_Observed BOOLEAN,
-        Sex VARCHAR(50),
+        Sex TEXT,
         PIF_Watchlist_Status BOOLEAN,
         Regional_Stewardship_Status BOOLEAN,
-        Disturbance VARCHAR(100),
-        Plot_Name VARCHAR(100),
-        Sky VARCHAR(50),
-        Wind VARCHAR(50),
-        Observer VARCHAR(100),  -- Added Observer
-        Visit INT  -- Added Visit
+        Disturbance TEXT,
+        Plot_Name TEXT,
+        Sky TEXT,
+        Wind TEXT,
+        Observer TEXT,
+        Visit INT,
+        Source_Workbook TEXT,
+        Source_Sheet TEXT
+    ) ON COMMIT DROP;
+    """)
+
+# First days of the months the dates fall in
+def observation_months(dates):
+    return set(dates.dropna().dt.to_period('M').dt.start_time.dt.date)
+
+# The same for the observations in the cache files, reading only their dates
+def cached_months(data_paths, chunk_size=DEFAULT_CHUNK_SIZE):
+    months = set()
+    for _, chunk in iter_cached_chunks(data_paths, chunk_size, ['Date']):
+        months |= observation_months(chunk['Date'])
+    return months
+
+# Create the monthly partitions a load needs (months holds their first days) that do
+# not exist yet. CREATE TABLE ... PARTITION OF would lock readers out of
+# bird_observation_facts, so each partition is created on its own and attached, which
+# only locks the (empty) new table and the default partition. The loaders do this in
+# the schema step, which is committed before the load itself starts
+def create_partitions(cursor, months):
+    cursor.execute("SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = 'bird_observation_facts'::regclass;")
+    existing = {name for (name,) in cursor.fetchall()}
+    for month_start in sorted(months):
+        partition = f"bird_observation_facts_{month_start:%Y_%m}"
+        if partition in existing:
+            continue
+        month_end = (pd.Timestamp(month_start) + pd.offsets.MonthBegin(1)).date()
+        cursor.execute(sql.SQL("""
+        CREATE TABLE {partition} (LIKE bird_observation_facts INCLUDING DEFAULTS);
+        ALTER TABLE bird_observation_facts ATTACH PARTITION {partition} FOR VALUES FROM (%s) TO (%s);
+        """).format(partition=sql.Identifier(partition)), (month_start, month_end))
+
+# Add the admin units, plots, species and observers seen in the staged rows. Species
+# attributes are taken from the newest load
+def upsert_dimensions(cursor):
+    with stage("store.dimensions"):
+        cursor.execute("""
+        INSERT INTO bird_admin_units (Admin_Unit_Code)
+        SELECT DISTINCT Admin_Unit_Code FROM bird_observations_staging WHERE Admin_Unit_Code IS NOT NULL
+        ON CONFLICT (Admin_Unit_Code) DO NOTHING;
+
+        INSERT INTO bird_plots (Plot_Name, Admin_Unit_Id)
+        SELECT DISTINCT ON (s.Plot_Name) s.Plot_Name, a.Admin_Unit_Id
+        FROM bird_observations_staging s
+        LEFT JOIN bird_admin_units a USING (Admin_Unit_Code)
+        WHERE s.Plot_Name IS NOT NULL
+        ORDER BY s.Plot_Name
+        ON CONFLICT (Plot_Name) DO UPDATE SET Admin_Unit_Id = EXCLUDED.Admin_Unit_Id;
+
+        INSERT INTO bird_species (Scientific_Name, Common_Name, PIF_Watchlist_Status, Regional_Stewardship_Status)
+        SELECT DISTINCT ON (Scientific_Name) Scientific_Name, Common_Name, PIF_Watchlist_Status, Regional_Stewardship_Status
+        FROM bird_observations_staging
+        ORDER BY Scientific_Name
+        ON CONFLICT (Scientific_Name) DO UPDATE SET
+            Common_Name = EXCLUDED.Common_Name,
+            PIF_Watchlist_Status = EXCLUDED.PIF_Watchlist_Status,
+            Regional_Stewardship_Status = EXCLUDED.Regional_Stewardship_Status;
+
+        INSERT INTO bird_observers (Observer)
+        SELECT DISTINCT Observer FROM bird_observations_staging WHERE Observer IS NOT NULL
+        ON CONFLICT (Observer) DO NOTHING;
+        """)
+
+# Move the staged rows into the fact table, resolving the dimension ids
+def insert_facts(cursor):
+    with stage("store.facts") as record:
+        cursor.execute("""
+        INSERT INTO bird_observation_facts (
+            Date, Admin_Unit_Id, Plot_Id, Species_Id, Observer_Id, Location_Type, Interval_Length, ID_Method,
+            Temperature, Humidity, Distance, Flyover_Observed, Sex, Disturbance, Sky, Wind, Visit,
+            Source_Workbook, Source_Sheet
+        )
+        SELECT
+            s.Date, a.Admin_Unit_Id, p.Plot_Id, sp.Species_Id, o.Observer_Id, s.Location_Type, s.Interval_Length, s.ID_Method,
+            s.Temperature, s.Humidity, s.Distance, s.Flyover_Observed, s.Sex, s.Disturbance, s.Sky, s.Wind, s.Visit,
+            s.Source_Workbook, s.Source_Sheet
+        FROM bird_observations_staging s
+        JOIN bird_species sp USING (Scientific_Name)
+        LEFT JOIN bird_admin_units a USING (Admin_Unit_Code)
+        LEFT JOIN bird_plots p USING (Plot_Name)
+        LEFT JOIN bird_observers o USING (Observer);
+        """)
+        record["rows"] = cursor.rowcount
+    with stage("store.analyze"):
+        cursor.execute("ANALYZE bird_observation_facts, bird_admin_units, bird_plots, bird_species, bird_observers;")
+
+# One row per loaded workbook sheet, with a digest of the rows stored for it
+def create_sources_table(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS bird_observation_sources (
+        Source_Workbook VARCHAR(255),
+        Source_Sheet VARCHAR(100),
+        Row_Count INT,
+        Digest CHAR(64),
+        Loaded_At TIMESTAMP DEFAULT now(),
+        PRIMARY KEY (Source_Workbook, Source_Sheet)
     );
-    """
-    cursor.execute(create_table_query)
-    conn.commit()
-
-    # Insert data into the table
-    for _, row in df.iterrows():
-        insert_query = sql.SQL("""
-        INSERT INTO bird_observations (
-            Admin_Unit_Code, Location_Type, Interval_Length, ID_Method, Year, Month, Date, Scientific_Name,
-            Common_Name, Temperature, Humidity, Distance, Flyover_Observed, Sex,
-            PIF_Watchlist_Status, Regional_Stewardship_Status, Disturbance, Plot_Name, Sky, Wind, Observer, Visit
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
+    """)
+
+# Add a frame's rows to running per-(workbook, sheet) row counts and hashes. Feeding
+# the chunks of a streamed load in order gives the same digests as the whole frame
+def hash_sources(df, hashes):
+    for source, rows in df.groupby(SOURCE_COLUMNS, sort=False):
+        row_hashes = pd.util.hash_pandas_object(rows[OBSERVATION_COLUMNS], index=False)
+        count, sha256 = hashes.get(source, (0, hashlib.sha256()))
+        sha256.update(row_hashes.values.tobytes())
+        hashes[source] = (count + len(rows), sha256)
+    return hashes
+
+def finish_digests(hashes):
+    return {source: (count, sha256.hexdigest()) for source, (count, sha256) in hashes.items()}
+
+# Row count and content digest of every (workbook, sheet) in the cleaned data. The
+# digest is taken after imputation, so a sheet whose imputed values move with the
+# global means is treated as changed too
+def source_digests(df):
+    return finish_digests(hash_sources(df, {}))
+
+def record_sources(cursor, digests):
+    if not digests:
+        return
+    execute_values(cursor, """
+    INSERT INTO bird_observation_sources (Source_Workbook, Source_Sheet, Row_Count, Digest)
+    VALUES %s
+    ON CONFLICT (Source_Workbook, Source_Sheet)
+    DO UPDATE SET Row_Count = EXCLUDED.Row_Count, Digest = EXCLUDED.Digest, Loaded_At = now();
+    """, [(workbook, sheet, count, digest) for (workbook, sheet), (count, digest) in digests.items()])
+
+# Every committed load that changed bird_observations gets a new batch id; the
+# dashboard keys its query cache on the latest one
+def record_load_batch(cursor, mode, row_count):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS bird_load_batches (
+        Batch_Id SERIAL PRIMARY KEY,
+        Mode VARCHAR(20),
+        Row_Count INT,
+        Loaded_At TIMESTAMP DEFAULT now()
+    );
+    """)
+    cursor.execute("INSERT INTO bird_load_batches (Mode, Row_Count) VALUES (%s, %s);", (mode, row_count))
+
+# Rebuild every summary table, with indexes on the filter columns. The new tables are
+# built as <name>_new next to the live ones, which the dashboard keeps reading, and
+# swapped in at the end; only the swap locks readers out, until the commit that
+# follows it.
+#
+# A full build aggregates all of bird_observations. A delta build (incremental loads)
+# adds the rows of the changed sheets to the live table's counts and subtracts the
+# rows they replaced (see merge_staged_sources), so it costs the size of the summary
+# plus the changed rows rather than the whole fact table
+def build_summary_tables(cursor, delta=False):
+    start_time = time.perf_counter()
+    for table, columns in SUMMARY_TABLES.items():
+        with stage("store.summary", table=table, delta=delta) as record:
+            group_columns = sql.SQL(', ').join(map(sql.Identifier, SUMMARY_FILTER_COLUMNS + columns))
+            new_table = sql.Identifier(f"{table}_new")
+            cursor.execute(sql.SQL("DROP TABLE IF EXISTS {};").format(new_table))
+            if delta:
+                cursor.execute(sql.SQL("""
+                CREATE TABLE {new_table} AS
+                SELECT {columns}, SUM(observations)::bigint AS observations, SUM(sightings)::bigint AS sightings
+                FROM (
+                    SELECT {columns}, observations, sightings FROM {table}
+                    UNION ALL
+                    SELECT {columns}, 1, (scientific_name IS NOT NULL)::int FROM bird_observations
+                    WHERE (source_workbook, source_sheet) IN (SELECT source_workbook, source_sheet FROM bird_replaced_sources WHERE changed)
+                    UNION ALL
+                    SELECT {columns}, -1, -(scientific_name IS NOT NULL)::int FROM bird_replaced_observations
+                ) AS counts
+                GROUP BY {columns}
+                HAVING SUM(observations) > 0;
+                """).format(new_table=new_table, table=sql.Identifier(table), columns=group_columns))
+            else:
+                cursor.execute(sql.SQL("""
+                CREATE TABLE {new_table} AS
+                SELECT {columns}, COUNT(*) AS observations, COUNT(scientific_name) AS sightings
+                FROM bird_observations
+                GROUP BY {columns};
+                """).format(new_table=new_table, columns=group_columns))
+            record["rows"] = cursor.rowcount
+            cursor.execute(sql.SQL("CREATE INDEX ON {} (date);").format(new_table))
+            cursor.execute(sql.SQL("CREATE INDEX ON {} (admin_unit_code, location_type);").format(new_table))
+            cursor.execute(sql.SQL("ANALYZE {};").format(new_table))
+
+    with stage("store.summary_swap"):
+        for table in SUMMARY_TABLES:
+            cursor.execute(sql.SQL("DROP TABLE IF EXISTS {table}; ALTER TABLE {new_table} RENAME TO {table};").format(
+                table=sql.Identifier(table), new_table=sql.Identifier(f"{table}_new")))
+    print(f"{'Updated' if delta else 'Rebuilt'} {len(SUMMARY_TABLES)} summary tables in {time.perf_counter() - start_time:.2f}s")
+
+# Full reload from the staging table: empty the fact and dimension tables and load
+# everything again. TRUNCATE would lock readers out of the view until the commit;
+# with DELETE they keep seeing the old rows instead (autovacuum reclaims them later)
+def replace_staged_observations(cursor, digests, row_count):
+    cursor.execute("""
+    DELETE FROM bird_observation_facts;
+    DELETE FROM bird_plots;
+    DELETE FROM bird_admin_units;
+    DELETE FROM bird_species;
+    DELETE FROM bird_observers;
+    """)
+    upsert_dimensions(cursor)
+    insert_facts(cursor)
+
+    create_sources_table(cursor)
+    cursor.execute("DELETE FROM bird_observation_sources;")
+    record_sources(cursor, digests)
+    build_summary_tables(cursor)
+    record_load_batch(cursor, "full", row_count)
+
+def replace_observations(cursor, df, method, batch_size):
+    create_staging_table(cursor)
+    load_rows(cursor, df, "bird_observations_staging", method, batch_size)
+    replace_staged_observations(cursor, source_digests(df), len(df))
+
+# New or changed and removed (workbook, sheet) pairs, compared with the last load
+def diff_sources(cursor, digests):
+    cursor.execute("SELECT Source_Workbook, Source_Sheet, Digest FROM bird_observation_sources;")
+    loaded = {(workbook, sheet): digest for workbook, sheet, digest in cursor.fetchall()}
+
+    changed = [source for source, (_, digest) in digests.items() if loaded.get(source) != digest]
+    removed = [source for source in loaded if source not in digests]
+    print(f"{len(changed)} new or changed sheets, {len(removed)} removed, {len(digests) - len(changed)} unchanged")
+    return changed, removed
+
+def summary_tables_missing(cursor):
+    cursor.execute("SELECT bool_or(to_regclass(name) IS NULL) FROM unnest(%s::text[]) AS name;", (list(SUMMARY_TABLES),))
+    return cursor.fetchone()[0]
+
+# Databases loaded before a summary table was added still need it built once
+def build_missing_summary_tables(cursor):
+    if summary_tables_missing(cursor):
+        build_summary_tables(cursor)
+        record_load_batch(cursor, "summary", 0)
+
+# Species attributes come from the newest load (see upsert_dimensions) and show up in
+# the rows of every sheet, so a staged row that changes them affects sheets that were
+# not reloaded as well
+def species_attributes_changed(cursor):
+    cursor.execute("""
+    SELECT EXISTS (
+        SELECT 1 FROM bird_observations_staging s JOIN bird_species sp USING (Scientific_Name)
+        WHERE (s.Common_Name, s.PIF_Watchlist_Status, s.Regional_Stewardship_Status)
+            IS DISTINCT FROM (sp.Common_Name, sp.PIF_Watchlist_Status, sp.Regional_Stewardship_Status)
+    );
+    """)
+    return cursor.fetchone()[0]
+
+# Replace the changed sheets (and drop sheets that disappeared) in the fact table
+# with the rows in the staging table, which must hold exactly the changed sheets.
+# The replaced rows are kept until the commit so the summary tables can subtract them
+def merge_staged_sources(cursor, changed, removed, digests):
+    cursor.execute("""
+    CREATE TEMP TABLE bird_replaced_sources (
+        Source_Workbook TEXT,
+        Source_Sheet TEXT,
+        Changed BOOLEAN
+    ) ON COMMIT DROP;
+    """)
+    execute_values(cursor, "INSERT INTO bird_replaced_sources VALUES %s;",
+                   [(*source, True) for source in changed] + [(*source, False) for source in removed])
+
+    delta = not summary_tables_missing(cursor) and not species_attributes_changed(cursor)
+    if delta:
+        cursor.execute("""
+        CREATE TEMP TABLE bird_replaced_observations ON COMMIT DROP AS
+        SELECT * FROM bird_observations
+        WHERE (source_workbook, source_sheet) IN (SELECT source_workbook, source_sheet FROM bird_replaced_sources);
         """)
-        cursor.execute(insert_query, tuple(row))
-    conn.commit()
 
-    cursor.close()
-    conn.close()
+    upsert_dimensions(cursor)
+    cursor.execute("""
+    DELETE FROM bird_observation_facts f USING bird_replaced_sources r
+    WHERE f.Source_Workbook = r.Source_Workbook AND f.Source_Sheet = r.Source_Sheet;
+    """)
+    insert_facts(cursor)
+
+    if removed:
+        execute_values(cursor, """
+        DELETE FROM bird_observation_sources WHERE (Source_Workbook, Source_Sheet) IN (VALUES %s);
+        """, removed)
+    record_sources(cursor, {source: digests[source] for source in changed})
+    build_summary_tables(cursor, delta)
+    record_load_batch(cursor, "incremental", sum(digests[source][0] for source in changed))
+
+# Incremental reload: stage the rows of new or changed sheets, then replace just
+# those sheets in the fact table
+def merge_changed_sources(cursor, df, method, batch_size):
+    digests = source_digests(df)
+    changed, removed = diff_sources(cursor, digests)
+    if not changed and not removed:
+        build_missing_summary_tables(cursor)
+        return
+
+    create_staging_table(cursor)
+    delta = df[pd.MultiIndex.from_frame(df[SOURCE_COLUMNS]).isin(changed)]
+    load_rows(cursor, delta, "bird_observations_staging", method, batch_size)
+    merge_staged_sources(cursor, changed, removed, digests)
+
+# Step 3: Store Data in PostgreSQL
+# The schema is set up and committed first. The load itself, including the summary
+# tables, runs in a single transaction, so readers keep seeing the previous data
+# until the new data is committed
+def store_data_in_postgres(df, method="copy", batch_size=DEFAULT_BATCH_SIZE, incremental=False):
+    conn = connect_to_postgres()
+    cursor = conn.cursor()
+
+    try:
+        with stage("store", method=method, rows=len(df)) as record:
+            with stage("store.schema"):
+                drop_legacy_table(cursor)
+                create_schema(cursor)
+                create_partitions(cursor, observation_months(df['Date']))
+                conn.commit()
+
+            # Incremental loads need the per-sheet digests written by an earlier load
+            cursor.execute("SELECT to_regclass('bird_observation_sources') IS NOT NULL;")
+            record["incremental"] = bool(incremental and cursor.fetchone()[0])
+            if record["incremental"]:
+                merge_changed_sources(cursor, df, method, batch_size)
+            else:
+                replace_observations(cursor, df, method, batch_size)
+            with stage("store.commit"):
+                conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+# Second pass of streaming mode: impute each cached chunk with the global means and
+# write it to the staging table, hashing the sheets along the way
+def stage_cached_chunks(cursor, data_paths, means, method, batch_size, chunk_size):
+    start_time = time.perf_counter()
+    hashes, row_count = {}, 0
+    with stage("stream.stage_rows", method=method) as record:
+        for _, df in iter_cached_chunks(data_paths, chunk_size):
+            df = df.fillna(means)
+            write_rows(cursor, df, "bird_observations_staging", method, batch_size)
+            hash_sources(df, hashes)
+            row_count += len(df)
+        record["rows"] = row_count
+    report_throughput(row_count, method, start_time)
+    return finish_digests(hashes), row_count
+
+# Streaming alternative to load_and_clean_data + store_data_in_postgres for
+# workbooks too large to hold in memory. Sheets are read, cleaned and written to the
+# Parquet cache chunk by chunk, then the cache is read back twice: once for the
+# imputation means and once to impute and stage the rows. At most chunk_size rows
+# are in memory at a time, and the result matches the in-memory load
+def stream_data_to_postgres(workbooks=WORKBOOKS, cache_dir=CACHE_DIR, chunk_size=DEFAULT_CHUNK_SIZE,
+                            method="copy", batch_size=DEFAULT_BATCH_SIZE, incremental=False):
+    with stage("stream", method=method):
+        data_paths = stream_workbooks_to_cache(workbooks, cache_dir, chunk_size)
+        means = running_means(data_paths, chunk_size)
+        store_streamed_rows(data_paths, means, chunk_size, method, batch_size, incremental)
+
+def store_streamed_rows(data_paths, means, chunk_size, method, batch_size, incremental):
+    conn = connect_to_postgres()
+    cursor = conn.cursor()
+
+    try:
+        with stage("store.schema"):
+            drop_legacy_table(cursor)
+            create_schema(cursor)
+            create_partitions(cursor, cached_months(data_paths, chunk_size))
+            conn.commit()
+        cursor.execute("SELECT to_regclass('bird_observation_sources') IS NOT NULL;")
+        incremental = incremental and cursor.fetchone()[0]
+
+        # Every row is staged, since the digests are only known once all chunks have
+        # been read; an incremental load then keeps just the changed sheets
+        create_staging_table(cursor)
+        digests, row_count = stage_cached_chunks(cursor, data_paths, means, method, batch_size, chunk_size)
+        if not row_count:
+            raise ValueError("No valid data found in the Excel sheets.")
+
+        if not incremental:
+            replace_staged_observations(cursor, digests, row_count)
+        else:
+            changed, removed = diff_sources(cursor, digests)
+            if not changed and not removed:
+                build_missing_summary_tables(cursor)
+            else:
+                if changed:
+                    execute_values(cursor, """
+                    DELETE FROM bird_observations_staging WHERE (Source_Workbook, Source_Sheet) NOT IN (VALUES %s);
+                    """, changed, page_size=len(changed))
+                else:
+                    cursor.execute("TRUNCATE bird_observations_staging;")
+                merge_staged_sources(cursor, changed, removed, digests)
+        with stage("store.commit"):
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+# Step 4: Storage Backends
+# The loader and the dashboard talk to storage through a backend object:
+#   store(df, ...)        store cleaned observations and rebuild the summary tables
+#   store_stream(...)     the same from the workbooks, in streaming mode
+#   query(sql, params)    run a dashboard query (psycopg2-style %s parameters); an
+#                         optional started callback receives a QueryCanceller that
+#                         cancels the query from another thread
+#   data_version()        id of the last load, or None
+#   explain(sql, params)  the query plan as text
+
+# Cancels one query from another thread. Backends revoke it before the connection
+# or cursor it cancels is reused, so a late cancel does nothing rather than hitting
+# whichever query runs on that connection next
+class QueryCanceller:
+    def __init__(self, cancel):
+        self.cancel = cancel
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            if self.cancel:
+                self.cancel()
+
+    def revoke(self):
+        with self.lock:
+            self.cancel = None
+
+# PostgreSQL through psycopg2; dashboard queries use a pool of connections. Queries
+# wait up to POOL_WAIT_SECONDS for a free connection when all of them are in use
+class PostgresBackend:
+    name = "PostgreSQL"
+
+    def __init__(self, min_connections=POOL_MIN_CONNECTIONS, max_connections=POOL_MAX_CONNECTIONS):
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self.pool = None
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_connections)
+
+    def store(self, df, method="copy", batch_size=DEFAULT_BATCH_SIZE, incremental=False):
+        store_data_in_postgres(df, method, batch_size, incremental)
+
+    def store_stream(self, workbooks=WORKBOOKS, cache_dir=CACHE_DIR, chunk_size=DEFAULT_CHUNK_SIZE, incremental=False):
+        stream_data_to_postgres(workbooks, cache_dir, chunk_size, incremental=incremental)
+
+    def get_pool(self):
+        with self.lock:
+            if self.pool is None:
+                self.pool = ThreadedConnectionPool(self.min_connections, self.max_connections, **POSTGRES_SETTINGS)
+        return self.pool
+
+    # A cancelled query raises QueryCanceledError; its connection stays usable
+    def query(self, query, params=None, started=None):
+        pool = self.get_pool()
+        if not self.slots.acquire(timeout=POOL_WAIT_SECONDS):
+            raise TimeoutError(f"No database connection became free within {POOL_WAIT_SECONDS}s")
+        try:
+            conn = pool.getconn()
+            canceller = QueryCanceller(conn.cancel)
+            try:
+                if started:
+                    started(canceller)
+                return pd.read_sql(query, conn, params=params)
+            finally:
+                canceller.revoke()
+                # End the read transaction so an idle pooled connection never holds locks
+                # that would block the loader from swapping tables
+                if not conn.closed:
+                    conn.rollback()
+                pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            self.slots.release()
+
+    # Last batch the loader committed (see record_load_batch)
+    def data_version(self):
+        try:
+            return int(self.query("SELECT COALESCE(MAX(batch_id), 0) AS batch_id FROM bird_load_batches;").at[0, "batch_id"])
+        except (psycopg2.Error, pd.errors.DatabaseError):
+            return None
+
+    def explain(self, query, params=None):
+        return "\n".join(self.query("EXPLAIN " + query, params).iloc[:, 0])
+
+# DuckDB over Parquet, in process. The observations and every summary table are
+# Parquet files in the warehouse directory, exposed to queries as views, so no
+# server is needed. Queries run vectorized on all cores and come back as Arrow
+# tables. Each file is swapped atomically, and the manifest (which holds the data
+# version) is written last
+class DuckDBBackend:
+    name = "DuckDB"
+
+    def __init__(self, directory=WAREHOUSE_DIR, threads=None):
+        self.directory = directory
+        self.connection = duckdb.connect(config={"threads": threads} if threads else {})
+        self.views_version = None
+        self.lock = threading.Lock()
+
+    def table_path(self, table):
+        return os.path.join(self.directory, f"{table}.parquet")
+
+    def read_manifest(self):
+        manifest_path = os.path.join(self.directory, "manifest.json")
+        if not os.path.exists(manifest_path):
+            return {}
+        with open(manifest_path) as f:
+            return json.load(f)
+
+    def write_manifest(self, digests):
+        manifest = {"batch_id": self.read_manifest().get("batch_id", 0) + 1, "digests": digests, "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        manifest_path = os.path.join(self.directory, "manifest.json")
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump(manifest, f)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+    def write_table(self, table, select):
+        path = self.table_path(table)
+        with stage("store.table", table=table):
+            self.connection.execute(f"COPY ({select}) TO '{sql_path(path + '.tmp')}' (FORMAT parquet);")
+            os.replace(path + ".tmp", path)
+
+    # Write the observations selected from source (imputing the columns in means) in
+    # the bird_observations view's layout, then aggregate the summary tables from them
+    def write_tables(self, source, means):
+        os.makedirs(self.directory, exist_ok=True)
+        columns = []
+        for col in TABLE_COLUMNS:
+            expr = f'"{col}"'
+            if col in means and not np.isnan(means[col]):
+                expr = f"COALESCE({expr}, {float(means[col])!r})"
+            elif col == "Date":
+                expr = f"CAST({expr} AS DATE)"
+            columns.append(f"{expr} AS {col.lower()}")
+        self.write_table("bird_observations", f"SELECT {', '.join(columns)} FROM {source}")
+
+        observations = f"read_parquet('{sql_path(self.table_path('bird_observations'))}')"
+        for table, summary_columns in SUMMARY_TABLES.items():
+            group_columns = ", ".join(SUMMARY_FILTER_COLUMNS + summary_columns)
+            self.write_table(table, f"""
+            SELECT {group_columns}, COUNT(*) AS observations, COUNT(scientific_name) AS sightings
+            FROM {observations}
+            GROUP BY {group_columns}
+            """)
+
+    # Incremental loads are skipped when no sheet changed; otherwise the files are
+    # rewritten, which in DuckDB is cheap compared to parsing the workbooks
+    def unchanged(self, digests, incremental):
+        tables = ["bird_observations", *SUMMARY_TABLES]
+        if incremental and self.read_manifest().get("digests") == digests and all(os.path.exists(self.table_path(t)) for t in tables):
+            print(f"0 new or changed sheets, 0 removed, {len(digests)} unchanged")
+            return True
+        return False
+
+    def store(self, df, method=None, batch_size=None, incremental=False):
+        digests = manifest_digests(source_digests(df))
+        if self.unchanged(digests, incremental):
+            return
+
+        with stage("store", backend="duckdb", rows=len(df)):
+            self.connection.register("cleaned_observations", df)
+            try:
+                self.write_tables("cleaned_observations", {})
+            finally:
+                self.connection.unregister("cleaned_observations")
+            self.write_manifest(digests)
+
+    # Impute while copying the streamed cache files into the warehouse; DuckDB reads
+    # them in chunks, so memory stays bounded here too. The sheets are hashed over the
+    # imputed chunks first, as stage_cached_chunks does, so the digests match store's
+    def store_stream(self, workbooks=WORKBOOKS, cache_dir=CACHE_DIR, chunk_size=DEFAULT_CHUNK_SIZE, incremental=False):
+        with stage("stream", backend="duckdb"):
+            data_paths = stream_workbooks_to_cache(workbooks, cache_dir, chunk_size)
+            means = running_means(data_paths, chunk_size)
+            hashes = {}
+            with stage("stream.hash"):
+                for _, df in iter_cached_chunks(data_paths, chunk_size):
+                    hash_sources(df.fillna(means), hashes)
+            digests = manifest_digests(finish_digests(hashes))
+            if self.unchanged(digests, incremental):
+                return
+
+            paths = ", ".join(f"'{sql_path(path)}'" for path in data_paths)
+            self.write_tables(f"read_parquet([{paths}])", means)
+            self.write_manifest(digests)
+
+    # (Re)create the views whenever a new load has been written
+    def create_views(self):
+        version = self.data_version()
+        with self.lock:
+            if version == self.views_version:
+                return
+            for table in ["bird_observations", *SUMMARY_TABLES]:
+                path = self.table_path(table)
+                if os.path.exists(path):
+                    self.connection.execute(f"CREATE OR REPLACE VIEW {table} AS SELECT * FROM read_parquet('{sql_path(path)}');")
+            self.views_version = version
+
+    # A cancelled query raises duckdb.InterruptException
+    def query(self, query, params=None, started=None):
+        self.create_views()
+        # A cursor is a separate connection to the same database, safe to use from
+        # the calling thread, and interrupting it stops only its own query
+        cursor = self.connection.cursor()
+        canceller = QueryCanceller(cursor.interrupt)
+        try:
+            if started:
+                started(canceller)
+            return cursor.execute(query.replace("%s", "?"), params or []).to_arrow_table().to_pandas()
+        finally:
+            canceller.revoke()
+            cursor.close()
+
+    def data_version(self):
+        return self.read_manifest().get("batch_id")
+
+    def explain(self, query, params=None):
+        return "\n".join(self.query("EXPLAIN " + query, params)["explain_value"])
+
+# The digests as stored in manifest.json, sorted so they compare equal however the
+# sheets were ordered
+def manifest_digests(digests):
+    return sorted([workbook, sheet, count, digest] for (workbook, sheet), (count, digest) in digests.items())
+
+# Quote a file path for use inside a DuckDB string literal
+def sql_path(path):
+    return path.replace("'", "''")
+
+BACKENDS = {"postgres": PostgresBackend, "duckdb": DuckDBBackend}
+
+def create_backend(name=None, **options):
+    name = name or BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend: {name} (expected one of {', '.join(BACKENDS)})")
+    return BACKENDS[name](**options)
 
 # Main Function for Execution
+# Options: --stream for the streaming mode, --backend=postgres|duckdb to override
+# BACKEND, --workers=N to parse the workbooks in N processes (in-memory mode only),
+# --profile[=cprofile|pyinstrument] to profile the whole run. Stage timings are
+# written to Profiling.STAGE_LOG when BIRD_STAGE_LOG is set
 if __name__ == "__main__":
-    # Load and clean data
-    df = load_and_clean_data()
+    profiler = next((arg for arg in sys.argv[1:] if arg.startswith("--profile")), None)
+    backend_name = next((arg.partition("=")[2] for arg in sys.argv[1:] if arg.startswith("--backend=")), None)
+    workers = int(next((arg.partition("=")[2] for arg in sys.argv[1:] if arg.startswith("--workers=")), 1))
+    backend = create_backend(backend_name)
+
+    with profile(profiler.partition("=")[2] or None) if profiler else contextlib.nullcontext() as profile_result:
+        if "--stream" in sys.argv[1:]:
+            # Stream the workbooks into storage with bounded memory
+            backend.store_stream(incremental=True)
+        else:
+            # Load and clean data
+            df = load_and_clean_data(workers=workers)
 
-    # Store data in PostgreSQL
-    store_data_in_postgres(df)
-    print("Data successfully loaded into PostgreSQL!")
+            # Store the data, reloading only the sheets that changed
+            backend.store(df, incremental=True)
+    print(f"Data successfully loaded into {backend.name}!")
+    if profiler:
+        print(f"Profile written to {profile_result['path']}")
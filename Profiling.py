@@ -0,0 +1,197 @@
+# Stage-level instrumentation shared by DataProcessing.py and Streamlit.py
+import contextlib
+import cProfile
+import io
+import json
+import logging
+import logging.handlers
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# When BIRD_STAGE_LOG names a file, every finished stage is written to it as one JSON
+# object per line. The log is off by default; a dashboard server adds records on
+# every rerun, so the file is rotated once it reaches STAGE_LOG_MAX_BYTES, keeping
+# STAGE_LOG_BACKUPS old files
+STAGE_LOG = os.environ.get("BIRD_STAGE_LOG", "")
+STAGE_LOG_MAX_BYTES = 10 * 1024 * 1024
+STAGE_LOG_BACKUPS = 3
+
+# Per-stage peak memory comes from tracemalloc, which slows Python-heavy code such as
+# openpyxl parsing down several times, so it is opt-in (BIRD_TRACE_MEMORY=1). Without
+# it only the process's peak RSS so far is recorded (process_peak_rss_mb), which is
+# a lifetime high-water mark rather than the stage's own memory. tracemalloc is
+# process-wide, so in the dashboard the peaks of concurrent sessions overlap
+TRACE_MEMORY = os.environ.get("BIRD_TRACE_MEMORY") == "1"
+
+# Profiler used by profile() by default ("cprofile" or "pyinstrument") and where
+# its output files go
+PROFILER = os.environ.get("BIRD_PROFILER", "cprofile")
+PROFILE_DIR = "profiles"
+
+logger = logging.getLogger("bird.stages")
+# Held while the log handler is added, so concurrent sessions add only one
+_logger_lock = threading.Lock()
+
+# Open stages and active collectors of the current thread (one thread per
+# Streamlit session rerun)
+_local = threading.local()
+
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack, _local.collectors = [], []
+    return _local.stack
+
+
+def _log(record):
+    if not STAGE_LOG:
+        return
+    if not logger.handlers:
+        with _logger_lock:
+            if not logger.handlers:
+                handler = logging.handlers.RotatingFileHandler(STAGE_LOG, maxBytes=STAGE_LOG_MAX_BYTES, backupCount=STAGE_LOG_BACKUPS, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                logger.addHandler(handler)
+    logger.info(json.dumps(record, default=str))
+
+
+# Peak resident set size of the process so far, in MB
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3  # bytes on macOS, kB on Linux
+
+
+# Time a stage and record its wall time, rows and peak memory. The record is yielded
+# so the stage can fill in "rows" (or other fields) once it knows them:
+#
+#     with stage("load.clean") as record:
+#         df = clean(...)
+#         record["rows"] = len(df)
+#
+# Stages nest; each record names its parent, and a parent's peak memory includes
+# its children's
+@contextlib.contextmanager
+def stage(name, **fields):
+    stack = _stack()
+    parent = stack[-1] if stack else None
+    record = {"stage": name, "at": time.strftime("%Y-%m-%dT%H:%M:%S"), **fields}
+    if parent:
+        record["parent"] = parent["record"]["stage"]
+
+    if TRACE_MEMORY and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    tracing = tracemalloc.is_tracing()
+    frame = {"record": record, "peak": 0, "start": 0}
+    if tracing:
+        # reset_peak() clears the parent's peak too, so it is saved on the parent first
+        current, peak = tracemalloc.get_traced_memory()
+        if parent:
+            parent["peak"] = max(parent["peak"], peak)
+        tracemalloc.reset_peak()
+        frame["start"] = current
+
+    stack.append(frame)
+    start_time = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        record["seconds"] = round(time.perf_counter() - start_time, 6)
+        stack.pop()
+        if tracing:
+            peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+            record["peak_mb"] = round((peak - frame["start"]) / 1e6, 3)
+            if parent:
+                parent["peak"] = max(parent["peak"], peak)
+        rss = peak_rss_mb()
+        if rss is not None:
+            record["process_peak_rss_mb"] = round(rss, 1)
+
+        _log(record)
+        for records in _local.collectors:
+            records.append(record)
+
+
+# Collect the records of every stage that finishes in this thread inside the block,
+# e.g. for the dashboard's performance panel
+@contextlib.contextmanager
+def collect():
+    _stack()
+    records = []
+    _local.collectors.append(records)
+    try:
+        yield records
+    finally:
+        _local.collectors.remove(records)
+
+
+# Wrap fn so that, called on another thread, its stages are collected and parented
+# as if they ran in this one (e.g. the queries a render runs on a thread pool)
+def in_this_context(fn):
+    stack = _stack()
+    parent, collectors = stack[-1:], list(_local.collectors)
+
+    def run(*args, **kwargs):
+        _stack()
+        saved = _local.stack, _local.collectors
+        _local.stack, _local.collectors = list(parent), collectors
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.stack, _local.collectors = saved
+
+    return run
+
+
+# Profile the block with cProfile or pyinstrument. The yielded dict gets the path of
+# the saved profile (.prof for cProfile, viewable with snakeviz; .html for
+# pyinstrument) and a text report once the block exits
+@contextlib.contextmanager
+def profile(kind=None, output_dir=PROFILE_DIR):
+    kind = kind or PROFILER
+    result = {}
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"profile-{time.strftime('%Y%m%d-%H%M%S')}")
+
+    if kind == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield result
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path + ".prof")
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(30)
+            result.update(path=path + ".prof", report=report.getvalue())
+    elif kind == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise ImportError("pyinstrument profiling needs the pyinstrument package: pip install pyinstrument") from None
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield result
+        finally:
+            profiler.stop()
+            with open(path + ".html", "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+            result.update(path=path + ".html", report=profiler.output_text())
+    else:
+        raise ValueError(f"Unknown profiler: {kind}")
@@ -1,290 +1,305 @@
+import asyncio
+import contextlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 import streamlit as st
-import psycopg2
-import plotly.express as px
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+import DataProcessing
+from Analysis import (
+    EDA_SECTIONS, FILTER_OPTIONS_QUERY, OBSERVATION_COUNT_QUERY, PREVIEW_QUERY, PREVIEW_ROWS, SECTION_QUERIES,
+    aggregate_query, build_where_clause,
+)
+from Profiling import collect, in_this_context, profile, stage
+
+# Query results are kept for up to QUERY_CACHE_TTL seconds, at most
+# QUERY_CACHE_MAX_ENTRIES of them
+QUERY_CACHE_TTL = 600
+QUERY_CACHE_MAX_ENTRIES = 512
+
+# The queries of a render run concurrently on at most QUERY_WORKERS threads per
+# server process, as many as the PostgreSQL pool has connections. While they run,
+# a progress caption is refreshed every QUERY_POLL_SECONDS
+QUERY_WORKERS = DataProcessing.POOL_MAX_CONNECTIONS
+QUERY_POLL_SECONDS = 0.1
+
+# Step 1: Connect to the Storage Backend
+# One backend (PostgreSQL connection pool or in-process DuckDB) per Streamlit server
+# process, shared by every session and rerun; DataProcessing.BACKEND selects it
+@st.cache_resource
+def get_backend():
+    return DataProcessing.create_backend()
+
+def run_query(query, params=None, started=None):
+    with stage("sql", query=" ".join(query.split())[:200]) as record:
+        df = get_backend().query(query, params, started)
+        record["rows"] = len(df)
+    return df
+
+# Id of the last load (see DataProcessing.record_load_batch), or None if there is
+# no data or the database predates batch tracking. It costs a round trip (a manifest
+# read for DuckDB), so create_dashboard reads it once per rerun and passes it down
+def get_data_version():
+    return get_backend().data_version()
 
-# Step 1: Connect to PostgreSQL Database
-def connect_to_postgres():
+# Query results are cached per (SQL, parameters, data version): a new load bumps
+# the version, which makes every earlier entry unreachable. _started (not part of
+# the cache key) is passed on to the backend, see run_query_async
+@st.cache_data(ttl=QUERY_CACHE_TTL, max_entries=QUERY_CACHE_MAX_ENTRIES, show_spinner=False)
+def run_cached_query(query, params, data_version, _started=None):
+    return run_query(query, params, _started)
+
+# Step 2: Query Data from the Backend
+# data_version keys the query cache (see get_data_version); name labels the query
+# in the stage log and the performance panel
+def query_data_from_postgres(query, data_version, params=None, name="query"):
     try:
-        conn = psycopg2.connect(
-            dbname="bird_db",
-            user="postgres",  # Replace with actual username
-            password="Phani@1pk",  # Replace with actual password
-            host="localhost",
-            port="5432"
-        )
-        return conn
+        get_backend()
     except Exception as e:
         st.error(f"Database connection failed: {e}")
-        return None
-
-# Step 2: Query Data from PostgreSQL
-def query_data_from_postgres(query):
-    conn = connect_to_postgres()
-    if conn is None:
         return pd.DataFrame()  # Return empty DataFrame if connection fails
     
     try:
-        df = pd.read_sql(query, conn)
+        with stage(f"query.{name}") as record:
+            df = run_cached_query(query, params, data_version)
+            record["rows"] = len(df)
         return df
     except Exception as e:
         st.error(f"Failed to execute query: {e}")
         return pd.DataFrame()
-    finally:
-        conn.close()
+
+# Run one of the AGGREGATE_QUERIES for the active filters. Errors are raised, not
+# shown, so that a failed query is never cached by the section that called it
+def fetch_aggregate(name, filters, data_version):
+    query, params = aggregate_query(name, filters)
+    with stage(f"query.{name}") as record:
+        df = run_cached_query(query, params, data_version)
+        record["rows"] = len(df)
+    return df
+
+# Once the filters are known the queries of a render are independent, so they are
+# started together and gathered: the render waits about as long as the slowest query
+# instead of their sum. Results go into the query cache, where query_data_from_postgres
+# and fetch_aggregate pick them up. The threads are shared by every session
+@st.cache_resource
+def get_query_executor():
+    return ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix="query")
+
+class QueryCancelled(Exception):
+    pass
+
+# Run one query on the executor. If the task is cancelled, a query that has not
+# started yet never does, and a running one is interrupted in the backend
+async def run_query_async(name, query, params, data_version):
+    ctx = get_script_run_ctx()
+    cancelled = threading.Event()
+    cancels = []
+
+    def started(cancel):
+        cancels.append(cancel)
+        if cancelled.is_set():
+            raise QueryCancelled(name)
+
+    def run():
+        # The session's context lets the cached function run on a pool thread
+        add_script_run_ctx(threading.current_thread(), ctx)
+        if cancelled.is_set():
+            raise QueryCancelled(name)
+        with stage(f"prefetch.{name}") as record:
+            df = run_cached_query(query, params, data_version, _started=started)
+            record["rows"] = len(df)
+        return df
+
+    future = asyncio.get_running_loop().run_in_executor(get_query_executor(), in_this_context(run))
+    try:
+        return await future
+    except asyncio.CancelledError:
+        cancelled.set()
+        for cancel in cancels:
+            cancel()
+        raise
+
+async def gather_queries(jobs, data_version, status):
+    tasks = [asyncio.create_task(run_query_async(name, query, params, data_version), name=name) for name, (query, params) in jobs.items()]
+    start_time = time.perf_counter()
+    try:
+        while True:
+            done, pending = await asyncio.wait(tasks, timeout=QUERY_POLL_SECONDS)
+            if not pending:
+                break
+            # Streamlit stops a run at its next st call once the user has changed a
+            # widget; the exception it raises here cancels the queries still running
+            status.caption(f"Running {len(tasks)} queries: {len(done)} done ({time.perf_counter() - start_time:.1f}s)")
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    status.empty()
+    # Retrieve failures so asyncio does not log them; the sequential read of a failed
+    # query runs it again and reports the error
+    return {task.get_name(): task.exception() for task in tasks if task.exception()}
+
+# Run {name: (SQL, parameters)} concurrently, showing progress in status (an st.empty
+# placeholder), and return the errors of the queries that failed
+def prefetch_queries(jobs, data_version, status):
+    with stage("prefetch", queries=len(jobs)):
+        return asyncio.run(gather_queries(jobs, data_version, status))
+
+# The backend's execution plan for a query, as text (not cached)
+def explain_query(query, params=None):
+    try:
+        return get_backend().explain(query, params)
+    except Exception as e:
+        return f"Failed to explain query: {e}"
+
+# Render a chart, optionally reporting how much JSON it sends to the browser
+def show_chart(fig, note=None):
+    # Serializing the figure to JSON happens inside st.plotly_chart
+    with stage("chart", title=fig.layout.title.text, rows=sum(len(trace.x) for trace in fig.data if trace.x is not None)):
+        st.plotly_chart(fig)
+    if note:
+        st.caption(note)
+    if st.session_state.get("show_payload_sizes"):
+        payload = len(fig.to_json().encode())
+        points = sum(len(trace.x) for trace in fig.data if trace.x is not None)
+        st.caption(f"Chart payload: {payload / 1024:.1f} kB, {points} points")
 
 # Step 3: Exploratory Data Analysis (EDA)
-def perform_eda(df):
+# The section builders are in Analysis.py. A section is cached per (filters, data
+# version), and only the open tab's section is built on a rerun
+@st.cache_data(ttl=QUERY_CACHE_TTL, max_entries=QUERY_CACHE_MAX_ENTRIES, show_spinner=False)
+def build_section(name, filters, data_version):
+    return EDA_SECTIONS[name](lambda query_name: fetch_aggregate(query_name, filters, data_version))
+
+def render_blocks(blocks):
+    for kind, *content in blocks:
+        if kind == "subheader":
+            st.subheader(content[0])
+        elif kind == "chart":
+            show_chart(*content)
+        else:
+            st.write(content[0])
+
+def perform_eda(filters, data_version):
     st.header("Exploratory Data Analysis (EDA)")
 
-    if df.empty:
-        st.warning("No data available for analysis.")
-        return
-    
-    # 1. Temporal Analysis: Observations by Date
-    st.subheader("1. Temporal Analysis Observations by Date")
-    if "date" in df.columns:
-        df["date"] = pd.to_datetime(df["date"])  # Ensure date is in datetime format
-        date_counts = df["date"].value_counts().sort_index()
-        fig = px.line(x=date_counts.index, y=date_counts.values, labels={'x': 'Date', 'y': 'Number of Observations'})
-        st.plotly_chart(fig)
-        st.write("**Summary:** The temporal analysis shows the number of bird observations over time. Peaks in the graph indicate periods of higher bird activity, which may correlate with migration or breeding seasons.")
-
-    # 2. Spatial Analysis: Species Diversity by Location Type
-    st.subheader("2. Spatial Analysis")
-    if "location_type" in df.columns and "scientific_name" in df.columns:
-        location_diversity = df.groupby('location_type')['scientific_name'].nunique().reset_index()
-        location_diversity.columns = ['Location Type', 'Number of Species']
-
-        fig_species_diversity = px.bar(
-            location_diversity, 
-            x='Location Type', 
-            y='Number of Species', 
-            title='Species Richness by Location Type', 
-            color='Location Type'
-        )
-        st.plotly_chart(fig_species_diversity)
-        st.write("**Summary:** This chart compares species richness across different location types (e.g., forest, grassland). It highlights which habitats support the highest biodiversity.")
-
-    # Plot-Level Analysis: Observations by Plot Name
-    if "plot_name" in df.columns:
-        plot_observations = df.groupby('plot_name')['scientific_name'].nunique().reset_index()
-        plot_observations.columns = ['Plot Name', 'Number of Species']
-        fig_plot_observations = px.bar(plot_observations, x='Plot Name', y='Number of Species', title='Species Observations by Plot Name', color='Plot Name')
-        st.plotly_chart(fig_plot_observations)
-        st.write("**Summary:** This analysis shows the number of unique species observed in each plot. Plots with higher species counts may indicate biodiversity hotspots.")
-
-    # 3. Species Analysis
-    st.subheader("3. Species Analysis")
-    # Activity Patterns: Check most common activity types
-    if "interval_length" in df.columns and "id_method" in df.columns:
-        activity_patterns = df.groupby(['interval_length', 'id_method']).size().reset_index(name='Observations')
-        fig_activity = px.bar(activity_patterns, x='interval_length', y='Observations', color='id_method', title="Activity Patterns by Interval Length and Method")
-        st.plotly_chart(fig_activity)
-        st.write("**Summary:** This chart shows the most common bird activity patterns based on observation intervals and identification methods. It helps identify preferred observation durations and methods.")
-
-    # Sex Ratio: Analyze male-to-female ratio for different species
-    if "sex" in df.columns:
-        sex_ratio = df.groupby(['scientific_name', 'sex']).size().reset_index(name='Count')
-        fig_sex_ratio = px.bar(sex_ratio, x='scientific_name', y='Count', color='sex', title="Sex Ratio for Species")
-        st.plotly_chart(fig_sex_ratio)
-        st.write("**Summary:** The sex ratio analysis reveals the male-to-female distribution across species. Some species may show a skewed ratio, which could indicate gender-based behavioral differences.")
-
-    # 4. Environmental Conditions: Weather Correlation
-    if "temperature" in df.columns and "humidity" in df.columns and "sky" in df.columns and "wind" in df.columns:
-        st.subheader("4. Environmental Conditions: Weather Correlation")
-        weather_conditions = df.groupby(['temperature', 'humidity', 'sky', 'wind']).size().reset_index(name='Observations')
-        fig_weather = px.scatter(weather_conditions, x='temperature', y='humidity', color='sky', title="Weather Correlation with Observations")
-        st.plotly_chart(fig_weather)
-        st.write("**Summary:** This scatter plot explores the relationship between weather conditions (temperature, humidity, sky, wind) and bird observations. Certain weather conditions may correlate with higher bird activity.")
-
-    if "disturbance" in df.columns:
-        st.subheader("Impact of Disturbance on Bird Sightings")
-        disturbance_effect = df.groupby('disturbance')['scientific_name'].count().reset_index()
-        disturbance_effect.columns = ['Disturbance', 'Sighting_Count']
-        fig = px.bar(disturbance_effect, 
-                     x='Disturbance', 
-                     y='Sighting_Count', 
-                     title='Impact of Disturbance on Bird Sightings',
-                     labels={'Disturbance': 'Disturbance Type', 'Sighting_Count': 'Number of Bird Sightings'},
-                     color='Sighting_Count', color_continuous_scale='Viridis')
-        fig.update_layout(xaxis_title='Disturbance Type', yaxis_title='Number of Bird Sightings')
-        fig.update_xaxes(tickangle=45)  # Rotate x-axis labels for better readability
-        st.plotly_chart(fig)
-        st.write("**Summary:** This chart shows how different types of disturbances (e.g., human activity, weather events) impact bird sightings. Some disturbances may reduce bird activity, while others may have no significant effect.")
-
-    # 5. Distance and Behavior
-    st.subheader("5. Distance and Behavior")
-    if "distance" in df.columns:
-        st.subheader("Distance Analysis")
-        distance_counts = df["distance"].value_counts().reset_index()
-        distance_counts.columns = ["Distance", "Count"]
-        
-        fig_distance = px.bar(
-            distance_counts,
-            x="Distance",
-            y="Count",
-            title="Distribution of Observation Distances",
-            labels={"Count": "Number of Observations"},
-            color="Distance"
-        )
-        st.plotly_chart(fig_distance)
-        st.write("**Summary:** This bar chart shows the distribution of observation distances. It helps identify whether birds are typically observed closer or farther from the observer.")
-
-    # Flyover Frequency: Detect trends in bird behavior during observation (Flyover_Observed)
-    if "flyover_observed" in df.columns:
-        st.subheader("Flyover Frequency Analysis")
-        flyover_counts = df["flyover_observed"].value_counts().reset_index()
-        flyover_counts.columns = ["Flyover Observed", "Count"]
-        fig_flyover = px.bar(
-            flyover_counts,
-            x="Flyover Observed",
-            y="Count",
-            title="Flyover Frequency",
-            labels={"Count": "Number of Observations"},
-            color="Flyover Observed"
-        )
-        st.plotly_chart(fig_flyover)
-        st.write("**Summary:** This chart shows how often flyovers (birds flying overhead) are observed. Frequent flyovers may indicate migration patterns or preferred flight paths.")
-
-    # 6. Observer Trends & Bias Analysis
-    st.subheader("6. Observer Trends")
-    if "observer" in df.columns:
-        observer_counts = df.groupby('observer')['scientific_name'].nunique().reset_index()
-        observer_counts.columns = ['Observer', 'Unique Species Count']
-        fig_observer_bias = px.bar(
-            observer_counts, 
-            x='Observer', 
-            y='Unique Species Count', 
-            title='Observer Trends and Bias', 
-            color='Observer'
-        )
-        st.plotly_chart(fig_observer_bias)
-        st.write("**Summary:** This chart highlights observer trends, showing how many unique species each observer has recorded. It helps identify potential observer bias or expertise.")
-
-    # Visit Patterns: Evaluate repeated visits and species count/diversity
-    if "visit" in df.columns:
-        st.subheader("Visit Patterns Analysis")
-        visit_counts = df.groupby('visit')['scientific_name'].nunique().reset_index()
-        visit_counts.columns = ['Visit', 'Number of Unique Species']
-        fig_visit_patterns = px.line(
-            visit_counts, 
-            x='Visit', 
-            y='Number of Unique Species', 
-            title='Visit Patterns and Species Diversity'
-        )
-        st.plotly_chart(fig_visit_patterns)
-        st.write("**Summary:** This line chart shows how species diversity changes with repeated visits to the same location. Increased diversity over time may indicate effective monitoring or seasonal changes.")
-
-    # 7. Conservation Insights: Watchlist Trends
-    st.subheader("7. Conservation Insights")
-    if "pif_watchlist_status" in df.columns and "regional_stewardship_status" in df.columns:
-        # Watchlist status trends: Count species in each status category
-        watchlist_status_counts = df.groupby('pif_watchlist_status')['scientific_name'].nunique().reset_index()
-        watchlist_status_counts.columns = ['Watchlist Status', 'Species Count']
-        fig_watchlist = px.bar(watchlist_status_counts, x='Watchlist Status', y='Species Count', title='Species Count by PIF Watchlist Status', color='Watchlist Status')
-        st.plotly_chart(fig_watchlist)
-        st.write("**Summary:** This chart shows the number of species on the PIF Watchlist, highlighting those at risk and requiring conservation focus.")
-
-        # Regional Stewardship Status trends
-        stewardship_status_counts = df.groupby('regional_stewardship_status')['scientific_name'].nunique().reset_index()
-        stewardship_status_counts.columns = ['Stewardship Status', 'Species Count']
-        fig_stewardship = px.bar(stewardship_status_counts, x='Stewardship Status', y='Species Count', title='Species Count by Regional Stewardship Status', color='Stewardship Status')
-        st.plotly_chart(fig_stewardship)
-        st.write("**Summary:** This chart highlights species under regional stewardship, indicating areas where conservation efforts are most needed.")
-
-    # 8. Distance vs. Species Heatmap
-    if "distance" in df.columns and "scientific_name" in df.columns:
-        distance_impact = df.groupby(["distance", "scientific_name"]).size().reset_index(name="count")
-        st.subheader("8. Distance vs. Species Heatmap")
-        fig_heatmap = px.density_heatmap(
-            distance_impact,
-            x="distance",
-            y="scientific_name",
-            z="count",
-            title="Heatmap of Distance vs. Species Observations",
-            labels={"count": "Observation Density", "distance": "Distance", "scientific_name": "Species"},
-            color_continuous_scale="Viridis"
-        )
-        st.plotly_chart(fig_heatmap)
-        st.write("**Summary:** This heatmap shows the relationship between observation distance and species. It helps identify species that are typically observed at specific distances.")
-
-    # 9. Number of Bird Species Observed at Different Temperatures
-    if "temperature" in df.columns and "scientific_name" in df.columns:
-        df['temperature'] = pd.to_numeric(df['temperature'], errors='coerce')
-        df_cleaned = df.dropna(subset=['temperature', 'scientific_name'])
-        temp_bird_counts = df_cleaned.groupby('temperature')['scientific_name'].nunique().reset_index()
-        temp_bird_counts.columns = ['Temperature', 'Number of Species']
-        fig = px.bar(temp_bird_counts, x='Temperature', y='Number of Species', 
-                     title='9. Number of Bird Species Observed at Different Temperatures',
-                     labels={'Temperature': 'Temperature (°C)', 'Number of Species': 'Unique Species Count'})
-        st.plotly_chart(fig)
-        st.write("**Summary:** This chart shows how bird species diversity varies with temperature. Certain temperature ranges may support higher biodiversity.")
+    # on_change="rerun" makes the tabs stateful, so closed tabs are not computed
+    tabs = st.tabs(list(EDA_SECTIONS), key="eda_section", on_change="rerun")
+    for tab, name in zip(tabs, EDA_SECTIONS):
+        if not tab.open:
+            continue
+        with tab, stage(f"eda.{name.lower()}"):
+            try:
+                blocks = build_section(name, filters, data_version)
+            except Exception as e:
+                st.error(f"Failed to load the {name} section: {e}")
+                continue
+            render_blocks(blocks)
 
 # Step 4: Create Streamlit Dashboard
-def create_dashboard(df):
+def create_dashboard():
     st.title("Bird Species Observation Analysis")
     st.write("This dashboard provides insights into bird species distribution and diversity across forests and grasslands.")
 
-    if df.empty:
+    try:
+        data_version = get_data_version()
+    except Exception as e:
+        st.error(f"Database connection failed: {e}")
+        return
+
+    filter_options = query_data_from_postgres(FILTER_OPTIONS_QUERY, data_version, name="filter_options")
+    if filter_options.empty or pd.isnull(filter_options.at[0, "min_date"]):
         st.warning("No data available.")
         return
+    options = filter_options.iloc[0]
 
     # Sidebar filters
     st.sidebar.header("Filters")
 
-    if "location_type" in df.columns:
-        location_type = st.sidebar.selectbox("Select Location Type", ["All", "Forest", "Grassland"])
-    else:
-        st.sidebar.write("Location Type data not available.")
-        location_type = "All"
-
-    if "admin_unit_code" in df.columns:
-        admin_units = df["admin_unit_code"].unique()
-        selected_admin_unit = st.sidebar.selectbox("Select Admin Unit Code", ["All"] + list(admin_units))
-    else:
-        selected_admin_unit = "All"
-    
-    if "date" in df.columns:
-        df["date"] = pd.to_datetime(df["date"])
-        min_date, max_date = df["date"].min(), df["date"].max()
-        date_range = st.sidebar.date_input("Select Date Range", [min_date, max_date], min_value=min_date, max_value=max_date)
-    else:
-        st.sidebar.write("Date data not available.")
-        date_range = None
-
-    if "disturbance" in df.columns:
-        disturbance_type = st.sidebar.multiselect("Select Disturbance Type", options=df["disturbance"].unique(), default=df["disturbance"].unique())
-    else:
-        st.sidebar.write("Disturbance data not available.")
-        disturbance_type = None
-
-    # Apply filters
-    filtered_df = df
-    if selected_admin_unit != "All":
-        filtered_df = filtered_df[filtered_df['admin_unit_code'] == selected_admin_unit]
-    if location_type and location_type != "All":
-        filtered_df = filtered_df[filtered_df['location_type'] == location_type]
-    if date_range and len(date_range) == 2:
-        start_date, end_date = pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1])
-        filtered_df = filtered_df[(filtered_df['date'] >= start_date) & (filtered_df['date'] <= end_date)]
-    if disturbance_type:
-        filtered_df = filtered_df[filtered_df['disturbance'].isin(disturbance_type)]
-
-    # Display filtered data
+    location_type = st.sidebar.selectbox("Select Location Type", ["All", "Forest", "Grassland"])
+
+    # Arrays come back as lists (PostgreSQL) or numpy arrays (DuckDB), or None
+    admin_units = list(options["admin_units"]) if options["admin_units"] is not None else []
+    selected_admin_unit = st.sidebar.selectbox("Select Admin Unit Code", ["All"] + list(admin_units))
+
+    min_date, max_date = options["min_date"], options["max_date"]
+    date_range = st.sidebar.date_input("Select Date Range", [min_date, max_date], min_value=min_date, max_value=max_date)
+
+    disturbances = list(options["disturbances"]) if options["disturbances"] is not None else []
+    disturbance_type = st.sidebar.multiselect("Select Disturbance Type", options=disturbances, default=disturbances)
+
+    # Collect the filters; they are applied in the backend by build_where_clause
+    filters = {
+        "admin_unit_code": selected_admin_unit if selected_admin_unit != "All" else None,
+        "location_type": location_type if location_type and location_type != "All" else None,
+        "date_range": tuple(date_range) if date_range and len(date_range) == 2 else None,
+        "disturbance": disturbance_type if disturbance_type else None,
+    }
+    where, params = build_where_clause(filters)
+    preview_query = PREVIEW_QUERY.format(where=where)
+
+    # Start the rest of the render's queries together: the count, the preview and the
+    # aggregates of the open EDA tab
+    jobs = {"observation_count": (OBSERVATION_COUNT_QUERY.format(where=where), params), "preview": (preview_query, params)}
+    open_section = st.session_state.get("eda_section") or next(iter(EDA_SECTIONS))
+    for name in SECTION_QUERIES.get(open_section, []):
+        jobs[name] = aggregate_query(name, filters)
+    prefetch_queries(jobs, data_version, st.empty())
+
+    observation_count = query_data_from_postgres(OBSERVATION_COUNT_QUERY.format(where=where), data_version, params, name="observation_count")
+    if observation_count.empty or observation_count.at[0, "n"] == 0:
+        st.warning("No data available for analysis.")
+        return
+
+    # Display a preview of the filtered data
     st.subheader("Filtered Data")
-    st.write(filtered_df)
+    st.caption(f"Showing up to {PREVIEW_ROWS} of {observation_count.at[0, 'n']} matching observations.")
+    st.write(query_data_from_postgres(preview_query, data_version, params, name="preview"))
+
+    # Plans for the preview (partition pruning on the date range, index scans on the
+    # other filters) and for a chart aggregate read from its summary table
+    st.sidebar.checkbox("Show chart payload sizes", key="show_payload_sizes")
+    if st.sidebar.checkbox("Show query plans"):
+        with st.expander("Query plans", expanded=True):
+            st.code(explain_query(preview_query, params))
+            st.code(explain_query(*aggregate_query("species_by_plot", filters)))
 
     # Perform EDA on filtered data
-    perform_eda(filtered_df)
+    perform_eda(filters, data_version)
+
+# Stage timings of this render (see Profiling.stage), plus the profiler report when
+# the render was profiled
+def show_performance_panel(records, profile_result=None):
+    st.header("Performance")
+    columns = {
+        "stage": "stage", "seconds": "seconds", "rows": "rows", "peak_mb": "stage peak (MB)",
+        "process_peak_rss_mb": "process peak RSS so far (MB)", "parent": "parent", "title": "title", "query": "query",
+    }
+    timings = pd.DataFrame(records)
+    timings = timings[[col for col in columns if col in timings.columns]].rename(columns=columns)
+    st.dataframe(timings, hide_index=True)
+    st.caption("Queries without a nested sql stage were served from the query cache.")
+    st.caption("Process peak RSS is the server process's high-water mark so far, not the stage's own memory; "
+               "per-stage peaks need BIRD_TRACE_MEMORY=1.")
+    if profile_result:
+        st.caption(f"Profile saved to {profile_result['path']}")
+        st.code(profile_result["report"])
 
 # Main Function for Streamlit App
 if __name__ == "__main__":
     st.sidebar.title("Data Source")
-    
-    # Query data from PostgreSQL
-    query = "SELECT * FROM bird_observations;"
-    df_from_postgres = query_data_from_postgres(query)
 
-    # Create Streamlit dashboard
-    create_dashboard(df_from_postgres)
+    # Profiling is opt-in and covers only the render started by the button
+    profiling = st.sidebar.button("Profile this render")
+
+    # Create Streamlit dashboard; every chart queries the backend for its own aggregate
+    with collect() as records, profile() if profiling else contextlib.nullcontext() as profile_result:
+        with stage("render"):
+            create_dashboard()
+
+    if st.sidebar.checkbox("Show performance panel"):
+        show_performance_panel(records, profile_result)
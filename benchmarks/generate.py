@@ -0,0 +1,145 @@
+# Synthetic monitoring workbooks with the same layout as the FOREST/GRASSLAND files
+#
+# Run from the repository root:  python benchmarks/generate.py ROWS [SHEETS] [OUTPUT_DIR]
+# ROWS observations are split evenly between a forest and a grassland workbook, and
+# each workbook gets SHEETS sheets (one per admin unit, like the real files).
+import datetime
+import os
+import sys
+
+import numpy as np
+from openpyxl import Workbook
+
+# Header of the real workbooks; the GRASSLAND file names two columns differently
+FOREST_COLUMNS = [
+    'Admin_Unit_Code', 'Sub_Unit_Code', 'Site_Name', 'Plot_Name', 'Location_Type', 'Year', 'Date',
+    'Start_Time', 'End_Time', 'Observer', 'Visit', 'Interval_Length', 'ID_Method', 'Distance',
+    'Flyover_Observed', 'Sex', 'Common_Name', 'Scientific_Name', 'AcceptedTSN', 'NPSTaxonCode',
+    'AOU_Code', 'PIF_Watchlist_Status', 'Regional_Stewardship_Status', 'Temperature', 'Humidity',
+    'Sky', 'Wind', 'Disturbance', 'Initial_Three_Min_Cnt'
+]
+GRASSLAND_COLUMNS = [
+    'TaxonCode' if col == 'NPSTaxonCode' else 'Previously_Obs' if col == 'Site_Name' else col
+    for col in FOREST_COLUMNS
+]
+
+# Value pools, modelled on the real data
+INTERVALS = ['0-2.5 min', '2.5 - 5 min', '5 - 7.5 min', '7.5 - 10 min']
+ID_METHODS = ['Singing', 'Calling', 'Visualization']
+DISTANCES = ['<= 50 Meters', '50 - 100 Meters']
+SEXES = ['Male', 'Female', 'Undetermined']
+SKIES = ['Clear or Few Clouds', 'Partly Cloudy', 'Cloudy/Overcast', 'Mist/Drizzle', 'Fog']
+WINDS = [
+    'Calm (< 1 mph) smoke rises vertically', 'Light air movement (1-3 mph) smoke drifts',
+    'Light breeze (4-7 mph) wind felt on face', 'Gentle breeze (8-12 mph), leaves in motion'
+]
+DISTURBANCES = ['No effect on count', 'Slight effect on count', 'Moderate effect on count', 'Serious effect on count']
+OBSERVERS = ['Elizabeth Oswald', 'Kimberly Serno', 'Brian Swimelar']
+SPECIES_COUNT = 150
+PLOTS_PER_UNIT = 50
+
+# Share of rows with a missing value, to exercise the cleaning steps
+MISSING_RATE = 0.02
+
+# Excel's sheet size limit, minus the header row
+MAX_SHEET_ROWS = 1048575
+
+
+def admin_units(sheets):
+    return [f"U{i:03d}" for i in range(sheets)]
+
+
+# Rows of one sheet as a list of columns; dates and times are Python objects so
+# openpyxl writes them as Excel dates
+def sheet_columns(rng, unit, location_type, rows):
+    species = rng.integers(0, SPECIES_COUNT, rows)
+    days = rng.integers(0, 120, rows)
+    start_minutes = rng.integers(5 * 60, 10 * 60, rows)
+    temperature = np.round(rng.normal(22, 4, rows), 1)
+    humidity = np.round(rng.uniform(40, 100, rows), 1)
+    temperature[rng.random(rows) < MISSING_RATE] = np.nan
+    humidity[rng.random(rows) < MISSING_RATE] = np.nan
+
+    def pick(pool, missing=0.0):
+        values = np.array(pool, dtype=object)[rng.integers(0, len(pool), rows)]
+        values[rng.random(rows) < missing] = None
+        return values
+
+    scientific = np.array([f"Avis species{i:03d}" for i in range(SPECIES_COUNT)], dtype=object)[species]
+    scientific[rng.random(rows) < MISSING_RATE / 2] = None
+    dates = [datetime.datetime(2018, 4, 1) + datetime.timedelta(days=int(d)) for d in days]
+    starts = [datetime.time(int(m) // 60, int(m) % 60) for m in start_minutes]
+    ends = [datetime.time((int(m) + 10) // 60, (int(m) + 10) % 60) for m in start_minutes]
+
+    return [
+        [unit] * rows,
+        [None] * rows,
+        [f"{unit} {i % 5 + 1}" for i in range(rows)],
+        [f"{unit}-{p:04d}" for p in rng.integers(0, PLOTS_PER_UNIT, rows)],
+        [location_type] * rows,
+        [2018] * rows,
+        dates,
+        starts,
+        ends,
+        pick(OBSERVERS),
+        rng.integers(1, 4, rows).tolist(),
+        pick(INTERVALS),
+        pick(ID_METHODS, MISSING_RATE / 10),
+        pick(DISTANCES, MISSING_RATE * 5),
+        (rng.random(rows) < 0.05).tolist(),
+        pick(SEXES, MISSING_RATE * 10),
+        [f"Bird {s:03d}" for s in species],
+        scientific,
+        (179000 + species).tolist(),
+        (83000 + species).tolist(),
+        [f"B{s:03d}" for s in species],
+        (species % 10 == 0).tolist(),
+        (species % 7 == 0).tolist(),
+        [None if np.isnan(t) else float(t) for t in temperature],
+        [None if np.isnan(h) else float(h) for h in humidity],
+        pick(SKIES),
+        pick(WINDS),
+        pick(DISTURBANCES),
+        (rng.random(rows) < 0.3).tolist(),
+    ]
+
+
+# Write one workbook with openpyxl's write-only mode, which streams rows to disk
+def write_workbook(path, location_type, columns, rows, sheets, seed):
+    rng = np.random.default_rng(seed)
+    sheet_rows = np.full(sheets, rows // sheets)
+    sheet_rows[:rows % sheets] += 1
+    if sheet_rows.max() > MAX_SHEET_ROWS:
+        raise ValueError(f"{rows} rows do not fit in {sheets} sheets; use more sheets")
+
+    workbook = Workbook(write_only=True)
+    for unit, count in zip(admin_units(sheets), sheet_rows):
+        sheet = workbook.create_sheet(unit)
+        sheet.append(columns)
+        # Sheets are generated in blocks so memory stays bounded at large scales
+        for start in range(0, int(count), 100000):
+            block = sheet_columns(rng, unit, location_type, min(100000, int(count) - start))
+            for row in zip(*block):
+                sheet.append(row)
+    workbook.save(path)
+
+
+# Generate a forest and a grassland workbook with ROWS observations in total and
+# return their paths, named like the real files
+def generate_workbooks(rows, sheets=10, output_dir='.benchmark_data', seed=0):
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for i, (location_type, columns) in enumerate([('Forest', FOREST_COLUMNS), ('Grassland', GRASSLAND_COLUMNS)]):
+        path = os.path.join(output_dir, f"Bird_Monitoring_Data_{location_type.upper()}.XLSX")
+        write_workbook(path, location_type, columns, rows // 2 + (rows % 2 if i == 0 else 0), sheets, seed + i)
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    sheets = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    output_dir = sys.argv[3] if len(sys.argv) > 3 else '.benchmark_data'
+
+    for path in generate_workbooks(rows, sheets, output_dir):
+        print(f"Wrote {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
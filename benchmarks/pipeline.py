@@ -0,0 +1,200 @@
+# End-to-end benchmark: synthetic workbooks -> cleaning -> storage backend -> dashboard queries
+#
+# Run from the repository root:
+#   python benchmarks/pipeline.py [--rows 10000] [--sheets 10] [--backend postgres|duckdb]
+#
+# Each stage is timed on its own (best of --repeats runs) and the results are written
+# as JSON. When a baseline file for the same scale exists, every stage is compared
+# against it and the exit status is 1 if any stage got slower than the tolerance.
+#
+# With the PostgreSQL backend the storage stages load into --database (its bird_*
+# tables are replaced), using the other credentials in DataProcessing.POSTGRES_SETTINGS;
+# create it first with `createdb bird_benchmark`. The DuckDB backend needs no server
+# and writes to --warehouse-dir. Pass --no-db to time only the Excel and cleaning stages.
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import Analysis  # noqa: E402
+import DataProcessing  # noqa: E402
+
+from generate import generate_workbooks  # noqa: E402
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# Stages faster than this are never reported as regressions; their timings are mostly noise
+MIN_REGRESSION_SECONDS = 0.005
+
+
+# Best wall time of a callable over several runs, and its last result
+def best_of(repeats, fn, *args, **kwargs):
+    timings = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        result = fn(*args, **kwargs)
+        timings.append(time.perf_counter() - start_time)
+    return min(timings), result
+
+
+# Workbooks are only regenerated when the requested scale changes
+def prepare_workbooks(rows, sheets, data_dir):
+    manifest_path = os.path.join(data_dir, 'generate.json')
+    scale = {'rows': rows, 'sheets': sheets}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            if json.load(f) == scale:
+                return [os.path.join(data_dir, os.path.basename(p)) for p in DataProcessing.WORKBOOKS]
+
+    start_time = time.perf_counter()
+    paths = generate_workbooks(rows, sheets, data_dir)
+    with open(manifest_path, 'w') as f:
+        json.dump(scale, f)
+    print(f"Generated {rows} rows in {sheets} sheets per workbook in {time.perf_counter() - start_time:.1f}s")
+    return paths
+
+
+# Filter sets the dashboard queries are timed with: no filters, and a narrow selection
+def filter_sets(df):
+    dates = df['Date'].sort_values()
+    return {
+        'all': {'admin_unit_code': None, 'location_type': None, 'date_range': None, 'disturbance': None},
+        'filtered': {
+            'admin_unit_code': df['Admin_Unit_Code'].iloc[0],
+            'location_type': 'Forest',
+            'date_range': (dates.iloc[len(dates) // 4].date(), dates.iloc[3 * len(dates) // 4].date()),
+            'disturbance': ['No effect on count', 'Slight effect on count'],
+        },
+    }
+
+
+def benchmark(args):
+    stages = {}
+
+    def record(name, seconds, rows):
+        stages[name] = {'seconds': round(seconds, 6), 'rows': int(rows)}
+        print(f"{name:55}{seconds * 1000:>12.1f} ms{rows:>12}")
+
+    paths = prepare_workbooks(args.rows, args.sheets, args.data_dir)
+
+    seconds, workbooks = best_of(args.repeats, lambda: {path: pd.read_excel(path, sheet_name=None) for path in paths})
+    record('excel_parse', seconds, sum(len(df) for sheets in workbooks.values() for df in sheets.values()))
+
+    def clean():
+        dfs = [DataProcessing.clean_sheets(path, sheets) for path, sheets in workbooks.items()]
+        return DataProcessing.merge_workbooks(dfs)
+    seconds, df = best_of(args.repeats, clean)
+    record('clean', seconds, len(df))
+    del workbooks
+
+    if args.no_db:
+        return stages, len(df)
+
+    DataProcessing.POSTGRES_SETTINGS = {**DataProcessing.POSTGRES_SETTINGS, 'dbname': args.database}
+    if args.backend == 'duckdb':
+        backend = DataProcessing.create_backend('duckdb', directory=args.warehouse_dir)
+    else:
+        backend = DataProcessing.create_backend('postgres')
+
+    seconds, _ = best_of(args.repeats, backend.store, df)
+    record('store.full', seconds, len(df))
+    seconds, _ = best_of(args.repeats, backend.store, df, incremental=True)
+    record('store.incremental_unchanged', seconds, 0)
+
+    # Queries go through the backend as the dashboard's do (pooled connections for
+    # PostgreSQL), without the dashboard's result cache
+    seconds, rows = best_of(args.repeats, backend.query, Analysis.FILTER_OPTIONS_QUERY)
+    record('dashboard.filter_options', seconds, len(rows))
+    for label, filters in filter_sets(df).items():
+        where, params = Analysis.build_where_clause(filters)
+        seconds, rows = best_of(args.repeats, backend.query, Analysis.OBSERVATION_COUNT_QUERY.format(where=where), params)
+        record(f'dashboard.count[{label}]', seconds, len(rows))
+        seconds, rows = best_of(args.repeats, backend.query, Analysis.PREVIEW_QUERY.format(where=where), params)
+        record(f'dashboard.preview[{label}]', seconds, len(rows))
+
+        for name, (query, group_columns) in Analysis.AGGREGATE_QUERIES.items():
+            where, params = Analysis.build_where_clause(filters, not_null=group_columns)
+            seconds, rows = best_of(args.repeats, backend.query, query.format(where=where), params)
+            record(f'eda.{name}[{label}]', seconds, len(rows))
+
+    return stages, len(df)
+
+
+# Stages that got slower than the baseline by more than the tolerance
+def compare(results, baseline, tolerance):
+    regressions = []
+    print(f"\n{'stage':55}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, stage in results['stages'].items():
+        if name not in baseline['stages']:
+            continue
+        before, after = baseline['stages'][name]['seconds'], stage['seconds']
+        change = after / before - 1 if before > 0 else 0.0
+        regressed = change > tolerance and after - before > MIN_REGRESSION_SECONDS
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{name:55}{before * 1000:>10.1f}ms{after * 1000:>10.1f}ms{change:>+10.0%}{flag}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark on synthetic workbooks")
+    parser.add_argument('--rows', type=int, default=10000, help="observations to generate (default: 10000)")
+    parser.add_argument('--sheets', type=int, default=10, help="sheets per workbook (default: 10)")
+    parser.add_argument('--repeats', type=int, default=3, help="runs per stage; the best is kept (default: 3)")
+    parser.add_argument('--data-dir', default='.benchmark_data', help="where the generated workbooks are kept")
+    parser.add_argument('--backend', choices=sorted(DataProcessing.BACKENDS), default='postgres', help="storage backend (default: postgres)")
+    parser.add_argument('--database', default='bird_benchmark', help="PostgreSQL database to load into")
+    parser.add_argument('--warehouse-dir', default='.benchmark_data/warehouse', help="DuckDB backend's Parquet directory")
+    parser.add_argument('--no-db', action='store_true', help="skip the storage and query stages")
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    parser.add_argument('--baseline', default=BASELINE, help="results to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.5, help="allowed slowdown per stage (default: 0.5 = 50%%)")
+    args = parser.parse_args()
+
+    stages, observations = benchmark(args)
+    results = {
+        'scale': {'rows': args.rows, 'sheets': args.sheets, 'observations': observations},
+        'backend': args.backend,
+        'environment': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'stages': stages,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved baseline to {args.baseline}")
+        sys.exit(0)
+
+    if not os.path.exists(args.baseline):
+        print("\nNo baseline to compare against; run with --save-baseline to create one")
+        sys.exit(0)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline['scale']['rows'] != args.rows or baseline['scale']['sheets'] != args.sheets:
+        print(f"\nBaseline was recorded at a different scale ({baseline['scale']}); not comparing")
+        sys.exit(0)
+    if baseline.get('backend', 'postgres') != args.backend:
+        print(f"\nBaseline was recorded with the {baseline.get('backend', 'postgres')} backend; not comparing")
+        sys.exit(0)
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} stages regressed: {', '.join(regressions)}")
+        sys.exit(1)
+    print("\nNo regressions")
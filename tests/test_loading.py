@@ -0,0 +1,286 @@
+# Loading pipeline checks on small synthetic workbooks (see benchmarks/generate.py)
+#
+# Run from the repository root:  python -m pytest tests
+# The DuckDB cases need no server. The PostgreSQL cases load into BIRD_TEST_DATABASE
+# (default bird_test; its bird_* tables are replaced) with the other credentials in
+# DataProcessing.POSTGRES_SETTINGS, and are skipped when it cannot be reached; create
+# it first with `createdb bird_test`.
+import contextlib
+import os
+import sys
+import threading
+import time
+
+import pandas as pd
+import psycopg2
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
+import DataProcessing  # noqa: E402
+import generate  # noqa: E402
+
+ROWS = 3000
+SHEETS = 4
+CHUNK_SIZE = 500
+
+TEST_DATABASE = os.environ.get('BIRD_TEST_DATABASE', 'bird_test')
+
+
+@pytest.fixture(scope='module')
+def workbooks(tmp_path_factory):
+    return generate.generate_workbooks(ROWS, SHEETS, str(tmp_path_factory.mktemp('workbooks')))
+
+
+@pytest.fixture(scope='module')
+def cleaned(workbooks):
+    return DataProcessing.load_and_clean_data(workbooks, use_cache=False)
+
+
+# Workbooks whose Plot_Name column holds only numbers and whose Observer column mixes
+# numbers and text, as real sheets sometimes do
+@pytest.fixture(scope='module')
+def numeric_text_workbooks(tmp_path_factory):
+    sheet_columns = generate.sheet_columns
+
+    def numeric_text_columns(rng, unit, location_type, rows):
+        columns = sheet_columns(rng, unit, location_type, rows)
+        plot, observer = generate.FOREST_COLUMNS.index('Plot_Name'), generate.FOREST_COLUMNS.index('Observer')
+        columns[plot] = [int(name[-4:]) for name in columns[plot]]
+        columns[observer] = [f'Obs{i % 7}' if i % 2 else i % 7 for i in range(rows)]
+        return columns
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(generate, 'sheet_columns', numeric_text_columns)
+        return generate.generate_workbooks(ROWS, SHEETS, str(tmp_path_factory.mktemp('numeric')))
+
+
+# A later state of the same workbooks: one sheet edited and one sheet removed
+def edit_sources(df):
+    workbook, sheet = df['Source_Workbook'].iloc[0], generate.admin_units(SHEETS)[0]
+    edited = df.copy()
+    edited.loc[(edited['Source_Workbook'] == workbook) & (edited['Source_Sheet'] == sheet), 'Observer'] = 'New Observer'
+    return edited[edited['Source_Sheet'] != generate.admin_units(SHEETS)[1]].reset_index(drop=True)
+
+
+# Rows of a bird_observations query, normalized so they compare equal to the cleaned
+# frame they were loaded from regardless of the backend's types and row order
+def normalize(df):
+    df = df.astype({col.lower(): str for col in DataProcessing.CATEGORICAL_COLUMNS})
+    df['date'] = pd.to_datetime(df['date']).astype('datetime64[us]')
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+def expected_observations(df):
+    return normalize(df[DataProcessing.TABLE_COLUMNS].rename(columns=str.lower))
+
+
+def assert_backend_matches(backend, df):
+    expected = expected_observations(df)
+    loaded = normalize(backend.query('SELECT * FROM bird_observations;'))
+    pd.testing.assert_frame_equal(loaded.astype(expected.dtypes.to_dict()), expected, check_exact=False)
+
+    # Every summary table holds the same counts as a fresh GROUP BY of the observations
+    for table, summary_columns in DataProcessing.SUMMARY_TABLES.items():
+        group_columns = ', '.join(DataProcessing.SUMMARY_FILTER_COLUMNS + summary_columns)
+        summary = backend.query(f'SELECT {group_columns}, observations, sightings FROM {table};')
+        regrouped = backend.query(f"""
+            SELECT {group_columns}, COUNT(*) AS observations, COUNT(scientific_name) AS sightings
+            FROM bird_observations GROUP BY {group_columns};
+        """)
+        as_text = lambda frame: frame.astype(str).sort_values(list(frame.columns)).reset_index(drop=True)
+        pd.testing.assert_frame_equal(as_text(summary), as_text(regrouped), obj=table)
+
+
+@pytest.mark.parametrize('workers', [4, None])
+def test_parallel_parse_matches_serial(workbooks, cleaned, workers):
+    parallel = DataProcessing.load_and_clean_data(workbooks, use_cache=False, workers=workers)
+    pd.testing.assert_frame_equal(parallel, cleaned)
+
+
+def test_cache_round_trip(workbooks, cleaned, tmp_path):
+    cache_dir = str(tmp_path)
+    pd.testing.assert_frame_equal(DataProcessing.load_and_clean_data(workbooks, cache_dir=cache_dir), cleaned)
+    for path in workbooks:
+        assert DataProcessing.cache_status(path, cache_dir)[0]
+    pd.testing.assert_frame_equal(DataProcessing.load_and_clean_data(workbooks, cache_dir=cache_dir), cleaned)
+
+
+def test_touched_workbook_keeps_its_cache(workbooks, tmp_path):
+    cache_dir = str(tmp_path)
+    DataProcessing.load_and_clean_data(workbooks, cache_dir=cache_dir)
+    stat = os.stat(workbooks[0])
+    os.utime(workbooks[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert DataProcessing.cache_status(workbooks[0], cache_dir)[0]
+
+
+def test_streamed_cache_matches_in_memory(workbooks, cleaned, tmp_path):
+    cache_dir = str(tmp_path)
+    data_paths = DataProcessing.stream_workbooks_to_cache(workbooks, cache_dir, CHUNK_SIZE)
+    streamed = DataProcessing.merge_workbooks([pd.read_parquet(path) for path in data_paths])
+    pd.testing.assert_frame_equal(streamed, cleaned)
+
+    # The regular loader reads the streamed cache, and the streamed chunks hash to the
+    # same per-sheet digests once imputed with the streaming means
+    pd.testing.assert_frame_equal(DataProcessing.load_and_clean_data(workbooks, cache_dir=cache_dir), cleaned)
+    means = DataProcessing.running_means(data_paths, CHUNK_SIZE)
+    hashes = {}
+    for _, chunk in DataProcessing.iter_cached_chunks(data_paths, CHUNK_SIZE):
+        DataProcessing.hash_sources(chunk.fillna(means), hashes)
+    assert DataProcessing.finish_digests(hashes) == DataProcessing.source_digests(cleaned)
+
+
+def test_caches_keep_numeric_text_as_text(numeric_text_workbooks, tmp_path):
+    data_paths = DataProcessing.stream_workbooks_to_cache(numeric_text_workbooks, str(tmp_path / 'streamed'), CHUNK_SIZE)
+    streamed = DataProcessing.merge_workbooks([pd.read_parquet(path) for path in data_paths])
+    # A cold load writes the Parquet cache, which a warm load then reads
+    in_memory = DataProcessing.load_and_clean_data(numeric_text_workbooks, cache_dir=str(tmp_path / 'cache'))
+    cached = DataProcessing.load_and_clean_data(numeric_text_workbooks, cache_dir=str(tmp_path / 'cache'))
+
+    for col in ['Plot_Name', 'Observer']:
+        assert streamed[col].map(type).eq(str).all()
+        pd.testing.assert_series_equal(streamed[col], in_memory[col].astype(str))
+        pd.testing.assert_series_equal(cached[col], streamed[col])
+
+
+def test_duckdb_loads(workbooks, cleaned, tmp_path):
+    backend = DataProcessing.create_backend('duckdb', directory=str(tmp_path / 'warehouse'))
+    backend.store(cleaned)
+    assert_backend_matches(backend, cleaned)
+
+    # An unchanged incremental load writes nothing
+    version = backend.data_version()
+    backend.store(cleaned, incremental=True)
+    assert backend.data_version() == version
+
+    edited = edit_sources(cleaned)
+    backend.store(edited, incremental=True)
+    assert backend.data_version() == version + 1
+    assert_backend_matches(backend, edited)
+
+    backend.store_stream(workbooks, str(tmp_path / 'cache'), CHUNK_SIZE, incremental=True)
+    assert_backend_matches(backend, cleaned)
+
+    # The streamed load records the same digests as the in-memory one
+    version = backend.data_version()
+    backend.store_stream(workbooks, str(tmp_path / 'cache'), CHUNK_SIZE, incremental=True)
+    backend.store(cleaned, incremental=True)
+    assert backend.data_version() == version
+
+
+@pytest.fixture
+def postgres(monkeypatch):
+    monkeypatch.setitem(DataProcessing.POSTGRES_SETTINGS, 'dbname', TEST_DATABASE)
+    try:
+        DataProcessing.connect_to_postgres().close()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f'PostgreSQL database {TEST_DATABASE} is not available: {e}')
+    return DataProcessing.create_backend('postgres')
+
+
+def sources(backend):
+    return backend.query('SELECT Source_Workbook, Source_Sheet, Digest FROM bird_observation_sources;')
+
+
+def test_postgres_incremental_loads(postgres, cleaned):
+    postgres.store(cleaned)
+    assert_backend_matches(postgres, cleaned)
+
+    # Only changed sheets are replaced: unchanged loads record no batch, and the
+    # digests follow the sheets that were edited or removed
+    version = postgres.data_version()
+    postgres.store(cleaned, incremental=True)
+    assert postgres.data_version() == version
+
+    edited = edit_sources(cleaned)
+    postgres.store(edited, incremental=True)
+    assert postgres.data_version() == version + 1
+    assert_backend_matches(postgres, edited)
+    expected = {source: digest for source, (_, digest) in DataProcessing.source_digests(edited).items()}
+    assert {(w, s): d for w, s, d in sources(postgres).itertuples(index=False)} == expected
+
+    # Changing a species attribute touches the rows of every sheet with that species,
+    # which rebuilds the summary tables in full
+    species = edited['Scientific_Name'].iloc[0]
+    renamed = edited.copy()
+    first_sheet = renamed['Source_Sheet'] == renamed['Source_Sheet'].iloc[0]
+    renamed.loc[first_sheet & (renamed['Scientific_Name'] == species), 'Common_Name'] = 'Renamed Bird'
+    postgres.store(renamed, incremental=True)
+    loaded = postgres.query('SELECT DISTINCT common_name FROM bird_observations WHERE scientific_name = %s;', [species])
+    assert loaded['common_name'].tolist() == ['Renamed Bird']
+
+    postgres.store(cleaned, incremental=True)
+    assert_backend_matches(postgres, cleaned)
+
+    # No build tables are left behind by the swaps
+    leftovers = postgres.query("SELECT tablename FROM pg_tables WHERE tablename LIKE 'bird_summary_%_new';")
+    assert leftovers.empty
+
+
+def test_postgres_streamed_loads(postgres, workbooks, cleaned, tmp_path):
+    cache_dir = str(tmp_path)
+    postgres.store_stream(workbooks, cache_dir, CHUNK_SIZE)
+    assert_backend_matches(postgres, cleaned)
+
+    edited = edit_sources(cleaned)
+    postgres.store(edited, incremental=True)
+    assert_backend_matches(postgres, edited)
+
+    postgres.store_stream(workbooks, cache_dir, CHUNK_SIZE, incremental=True)
+    assert_backend_matches(postgres, cleaned)
+
+
+# The canceller handed out for a finished query must not cancel the next query that
+# runs on the same pooled connection
+def test_postgres_stale_canceller_is_revoked(postgres):
+    cancellers = []
+    postgres.query('SELECT 1 AS x;', started=cancellers.append)
+
+    result = {}
+    later = threading.Thread(target=lambda: result.update(df=postgres.query('SELECT pg_sleep(0.5) AS x;')))
+    later.start()
+    time.sleep(0.2)
+    cancellers[0]()
+    later.join()
+    assert 'df' in result
+
+
+# A load that brings a new month and a row without a date keeps bird_observations
+# readable while it runs
+def test_postgres_load_does_not_block_readers(postgres, cleaned, monkeypatch):
+    postgres.store(cleaned)
+
+    later = cleaned.copy()
+    sheet = later['Source_Sheet'] == later['Source_Sheet'].iloc[0]
+    later.loc[sheet, 'Date'] += pd.DateOffset(years=10)
+    later.loc[sheet, 'Year'] += 10
+    later = later.astype({'Year': float, 'Month': float})
+    later.loc[later.index[0], ['Date', 'Year', 'Month']] = [pd.NaT, float('nan'), float('nan')]
+
+    reader = psycopg2.connect(**DataProcessing.POSTGRES_SETTINGS)
+    reader.autocommit = True
+    cursor = reader.cursor()
+    # Partitions left by an earlier run are empty; drop them so the load creates them
+    for month in DataProcessing.observation_months(later['Date']) - DataProcessing.observation_months(cleaned['Date']):
+        cursor.execute(f'DROP TABLE IF EXISTS bird_observation_facts_{month:%Y_%m};')
+    cursor.execute("SET statement_timeout = '1s';")
+    blocked, stage = [], DataProcessing.stage
+
+    @contextlib.contextmanager
+    def probing_stage(name, **fields):
+        if name in ('store.facts', 'store.summary'):
+            try:
+                cursor.execute('SELECT COUNT(*) FROM bird_observations;')
+            except psycopg2.errors.QueryCanceled:
+                blocked.append(name)
+        with stage(name, **fields) as record:
+            yield record
+
+    monkeypatch.setattr(DataProcessing, 'stage', probing_stage)
+    try:
+        postgres.store(later, incremental=True)
+    finally:
+        reader.close()
+        monkeypatch.setattr(DataProcessing, 'stage', stage)
+    assert blocked == []
+    assert_backend_matches(postgres, later)